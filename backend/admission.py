@@ -0,0 +1,191 @@
+import asyncio
+import math
+import time
+from fastapi.responses import JSONResponse
+from config import get_settings
+from database import pool_capacity
+
+settings = get_settings()
+
+# Routes that must stay responsive under load and are never queued.
+EXEMPT_PATHS = {"/health", "/metrics", "/docs", "/redoc", "/openapi.json"}
+# DB connections left for background threads (feed fan-out, topic stats,
+# search warmer, history compaction) when sizing limits to the pool.
+BACKGROUND_CONNECTIONS = 4
+
+
+def classify_request(method: str, path: str):
+    """Map a request to its route class, or None if it bypasses admission control"""
+    if path in EXEMPT_PATHS:
+        return None
+    if path.startswith("/api/auth/"):
+        return "auth"
+    if path.startswith("/api/search/"):
+        return "search"
+    if path.startswith("/api/admin/"):
+        return "admin"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "read"
+    return "write"
+
+
+def fit_to_pool(limits: dict, capacity) -> dict:
+    """Scale class concurrency down so admitted requests never wait on a pool checkout.
+
+    limits maps class -> (concurrency, max_queue). Every admitted request may
+    hold a connection, so without this, requests past the pool size would
+    queue invisibly inside the pool instead of in the admission queues.
+    """
+    if capacity is None:
+        return limits
+    available = max(len(limits), capacity - BACKGROUND_CONNECTIONS)
+    total = sum(concurrency for concurrency, _ in limits.values())
+    if total <= available:
+        return limits
+
+    shares = {name: concurrency * available / total for name, (concurrency, _) in limits.items()}
+    scaled = {name: max(1, int(share)) for name, share in shares.items()}
+    while sum(scaled.values()) > available:
+        name = max(scaled, key=scaled.get)
+        scaled[name] -= 1
+    while sum(scaled.values()) < available:
+        name = max(scaled, key=lambda name: shares[name] - scaled[name])
+        scaled[name] += 1
+    print(f"Admission concurrency scaled from {total} to {sum(scaled.values())} to fit the DB pool")
+    return {name: (scaled[name], max_queue) for name, (_, max_queue) in limits.items()}
+
+
+class AdmissionGate:
+    """Concurrency limit with a bounded FIFO wait queue and a queue-time deadline"""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = max(1, math.ceil(queue_timeout))
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+        self.active = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.total_wait_seconds = 0.0
+
+    async def acquire(self) -> bool:
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self.shed_queue_full += 1
+                return False
+
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.shed_timeout += 1
+                return False
+            finally:
+                self.waiting -= 1
+            self.total_wait_seconds += time.perf_counter() - started
+
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self.semaphore.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "peak_queue_depth": self.peak_waiting,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "avg_wait_ms": round(self.total_wait_seconds / self.admitted * 1000, 2)
+            if self.admitted
+            else 0.0,
+        }
+
+
+class AdmissionController:
+    def __init__(self, limits: dict, queue_timeout: float, enabled: bool = True):
+        self.enabled = enabled
+        self.gates = {
+            name: AdmissionGate(name, concurrency, max_queue, queue_timeout)
+            for name, (concurrency, max_queue) in limits.items()
+        }
+
+    def gate_for(self, method: str, path: str):
+        if not self.enabled:
+            return None
+        route_class = classify_request(method, path)
+        return self.gates.get(route_class) if route_class else None
+
+    def total_concurrency(self) -> int:
+        return sum(gate.concurrency for gate in self.gates.values())
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "db_pool_capacity": pool_capacity,
+            "classes": {name: gate.snapshot() for name, gate in self.gates.items()},
+        }
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware that admits, queues or sheds each request by route class"""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        gate = self.controller.gate_for(scope["method"], scope["path"])
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await gate.acquire():
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry shortly"},
+                status_code=503,
+                headers={"Retry-After": str(gate.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+
+admission_controller = AdmissionController(
+    limits=fit_to_pool(
+        {
+            "read": (settings.ADMISSION_READ_CONCURRENCY, settings.ADMISSION_READ_QUEUE),
+            "write": (settings.ADMISSION_WRITE_CONCURRENCY, settings.ADMISSION_WRITE_QUEUE),
+            "auth": (settings.ADMISSION_AUTH_CONCURRENCY, settings.ADMISSION_AUTH_QUEUE),
+            "search": (settings.ADMISSION_SEARCH_CONCURRENCY, settings.ADMISSION_SEARCH_QUEUE),
+            "admin": (settings.ADMISSION_ADMIN_CONCURRENCY, settings.ADMISSION_ADMIN_QUEUE),
+        },
+        pool_capacity,
+    ),
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    enabled=settings.ADMISSION_CONTROL_ENABLED,
+)
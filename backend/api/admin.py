@@ -0,0 +1,149 @@
+import tempfile
+from fastapi import APIRouter, Depends, File, HTTPException, Path, Query, UploadFile, status
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+from database import get_db
+from models import User
+from schemas import GroupCounterCheckResponse, ProfileSummaryResponse
+from dependencies import get_current_admin
+from group_counters import check_group_counters
+from profiling import PROFILE_ID_PATTERN, profile_store
+import bulk
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+FORMAT_PATTERN = "^(ndjson|parquet)$"
+
+
+def get_export_table(table: str):
+    try:
+        return bulk.get_table(table)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Table not found",
+        )
+
+
+@router.get("/export")
+def list_exportable_tables(current_user: User = Depends(get_current_admin)):
+    return {"tables": bulk.table_names()}
+
+
+@router.get("/export/{table}")
+def export_table(
+    table: str,
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    chunk_size: int = Query(bulk.DEFAULT_CHUNK_SIZE, ge=1, le=50000),
+    current_user: User = Depends(get_current_admin),
+):
+    db_table = get_export_table(table)
+
+    if format == "ndjson":
+        return StreamingResponse(
+            bulk.iter_ndjson(db_table, chunk_size),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{table}.ndjson"'},
+        )
+
+    # Parquet needs its footer written last, so spool to a temp file and
+    # stream that back instead of holding the table in memory.
+    try:
+        bulk.load_pyarrow()
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+
+    spool = tempfile.TemporaryFile()
+    bulk.write_parquet(db_table, spool, chunk_size)
+    spool.seek(0)
+
+    return StreamingResponse(
+        iter(lambda: spool.read(1024 * 1024), b""),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="{table}.parquet"'},
+        background=BackgroundTask(spool.close),
+    )
+
+
+@router.post("/import/{table}")
+def import_table(
+    table: str,
+    file: UploadFile = File(...),
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    chunk_size: int = Query(bulk.DEFAULT_CHUNK_SIZE, ge=1, le=50000),
+    transaction_rows: int = Query(bulk.DEFAULT_TRANSACTION_ROWS, ge=1),
+    skip_rows: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_admin),
+):
+    db_table = get_export_table(table)
+
+    try:
+        if format == "parquet":
+            bulk.load_pyarrow()
+            chunks = bulk.read_parquet(file.file, chunk_size)
+        else:
+            chunks = bulk.read_ndjson(db_table, file.file, chunk_size)
+        return bulk.import_chunks(db_table, chunks, transaction_rows, skip_rows)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    except bulk.BulkImportError as e:
+        # Earlier batches stay committed; tell the caller where to resume.
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": f"Import failed: {e.__cause__}",
+                "committed_rows": e.committed_rows,
+                "failed_at_row": e.failed_at_row,
+            },
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Import failed: {e}",
+        )
+
+
+@router.post("/group-counters/check", response_model=GroupCounterCheckResponse)
+def check_counters(
+    fix: bool = False,
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    return check_group_counters(db, fix=fix)
+
+
+@router.get("/profiles", response_model=list[ProfileSummaryResponse])
+def list_profiles(current_user: User = Depends(get_current_admin)):
+    return profile_store.list()
+
+
+def get_stored_profile(profile_id: str):
+    profile = profile_store.load(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found",
+        )
+    return profile
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(
+    profile_id: str = Path(..., pattern=PROFILE_ID_PATTERN),
+    current_user: User = Depends(get_current_admin),
+):
+    return get_stored_profile(profile_id)
+
+
+@router.get("/profiles/{profile_id}/flamegraph")
+def get_profile_flamegraph(
+    profile_id: str = Path(..., pattern=PROFILE_ID_PATTERN),
+    current_user: User = Depends(get_current_admin),
+):
+    get_stored_profile(profile_id)
+    return FileResponse(
+        profile_store.path(profile_id, "folded"),
+        media_type="text/plain",
+        filename=f"{profile_id}.folded",
+    )
@@ -1,33 +1,36 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
 from database import get_db
-from models import User, SearchHistory, Topic
+from models import User, Topic, Group, group_members
 from schemas import DashboardResponse, SearchHistoryResponse, GroupResponse, TopicResponse
 from dependencies import get_current_user
+from search_history import get_recent_searches
+from fieldsets import parse_field_list, sparse_response
+from api.groups import group_fieldset
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
 
+def get_recommended_topics(db: Session, current_user: User) -> list:
+    all_topics = db.query(Topic).limit(10).all()
+    return [topic for topic in all_topics if topic not in current_user.interests][:5]
+
+
 @router.get("", response_model=DashboardResponse)
 def get_dashboard(
+    fields: str = None,
+    expand: str = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    recent_searches = (
-        db.query(SearchHistory)
-        .filter(SearchHistory.user_id == current_user.id)
-        .order_by(desc(SearchHistory.searched_at))
-        .limit(10)
-        .all()
-    )
+    if fields is not None or expand is not None:
+        return get_sparse_dashboard(fields, expand, current_user, db)
+
+    recent_searches = get_recent_searches(db, current_user.id, limit=10)
 
     joined_groups = current_user.groups
 
-    all_topics = db.query(Topic).limit(10).all()
-    recommended_topics = [
-        topic for topic in all_topics if topic not in current_user.interests
-    ]
+    recommended_topics = get_recommended_topics(db, current_user)
 
     return {
         "recent_searches": [
@@ -37,6 +40,42 @@ def get_dashboard(
             GroupResponse.model_validate(group) for group in joined_groups
         ],
         "recommended_topics": [
-            TopicResponse.model_validate(topic) for topic in recommended_topics[:5]
+            TopicResponse.model_validate(topic) for topic in recommended_topics
         ],
     }
+
+
+def get_sparse_dashboard(
+    fields: str,
+    expand: str,
+    current_user: User,
+    db: Session,
+):
+    """Dashboard limited to the sections in `fields`; `expand` picks group relationships"""
+    sections = parse_field_list(fields, DashboardResponse.model_fields, "fields")
+    if sections is None:
+        sections = set(DashboardResponse.model_fields)
+    group_fields = group_fieldset(expand=expand or "")
+
+    content = {}
+    if "recent_searches" in sections:
+        content["recent_searches"] = [
+            SearchHistoryResponse.model_validate(search).model_dump()
+            for search in get_recent_searches(db, current_user.id, limit=10)
+        ]
+    if "joined_groups" in sections:
+        joined_groups = (
+            db.query(Group)
+            .join(group_members, group_members.c.group_id == Group.id)
+            .filter(group_members.c.user_id == current_user.id)
+            .options(*group_fields.options())
+            .all()
+        )
+        content["joined_groups"] = [group_fields.serialize(group) for group in joined_groups]
+    if "recommended_topics" in sections:
+        content["recommended_topics"] = [
+            TopicResponse.model_validate(topic).model_dump()
+            for topic in get_recommended_topics(db, current_user)
+        ]
+
+    return sparse_response(content)
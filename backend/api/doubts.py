@@ -1,20 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from database import get_db
 from models import User, Doubt
-from schemas import DoubtCreate, DoubtResponse, DoubtDetailResponse
+from schemas import (
+    DoubtCreate,
+    DoubtCreateResponse,
+    DoubtResponse,
+    DoubtDetailResponse,
+    SimilarDoubtResponse,
+    UserResponse,
+)
 from dependencies import get_current_user
+from fieldsets import FieldSet, sparse_response
+from similar_doubts import doubt_text, similar_doubts
+from topic_stats import topic_stats
+from config import get_settings
 
 router = APIRouter(prefix="/api/doubts", tags=["doubts"])
+settings = get_settings()
 
 
-@router.post("", response_model=DoubtResponse)
+def doubt_fieldset(fields: str = None, expand: str = None) -> FieldSet:
+    return FieldSet(
+        Doubt, DoubtDetailResponse, {"created_by_user": UserResponse}, fields, expand
+    )
+
+
+def find_similar_doubts(db: Session, text: str, limit: int, containment: bool = False) -> list:
+    matches = similar_doubts.query(
+        text,
+        limit=limit,
+        threshold=settings.SIMILAR_DOUBTS_QUERY_THRESHOLD
+        if containment
+        else settings.SIMILAR_DOUBTS_THRESHOLD,
+        containment=containment,
+    )
+    if not matches:
+        return []
+
+    doubts = {
+        doubt.id: doubt
+        for doubt in db.query(Doubt).filter(Doubt.id.in_([doubt_id for doubt_id, _ in matches]))
+    }
+    return [
+        SimilarDoubtResponse(
+            **DoubtResponse.model_validate(doubts[doubt_id]).model_dump(),
+            score=round(score, 3),
+        )
+        for doubt_id, score in matches
+        if doubt_id in doubts
+    ]
+
+
+@router.post("", response_model=DoubtCreateResponse, response_model_exclude_none=True)
 def create_doubt(
     doubt_data: DoubtCreate,
+    check_duplicates: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    text = doubt_text(doubt_data.title, doubt_data.description)
+    possible_duplicates = find_similar_doubts(db, text, limit=5) if check_duplicates else None
+
     new_doubt = Doubt(
         topic=doubt_data.topic,
         title=doubt_data.title,
@@ -23,30 +71,59 @@ def create_doubt(
     )
 
     db.add(new_doubt)
+    topic_stats.add(db, new_doubt.topic, doubts=1)
     db.commit()
     db.refresh(new_doubt)
+    similar_doubts.add(new_doubt.id, text)
 
-    return DoubtResponse.model_validate(new_doubt)
+    response = DoubtCreateResponse.model_validate(new_doubt)
+    response.possible_duplicates = possible_duplicates
+    return response
+
+
+@router.get("/similar", response_model=list[SimilarDoubtResponse])
+def get_similar_doubts(
+    text: str = Query(..., min_length=1),
+    limit: int = Query(5, ge=1, le=20),
+    db: Session = Depends(get_db),
+):
+    return find_similar_doubts(db, text, limit, containment=True)
 
 
 @router.get("", response_model=list[DoubtDetailResponse])
 def list_doubts(
     topic: str = None,
+    fields: str = None,
+    expand: str = None,
     db: Session = Depends(get_db),
 ):
-    query = db.query(Doubt).order_by(desc(Doubt.created_at))
+    fieldset = doubt_fieldset(fields, expand)
+    query = db.query(Doubt).options(*fieldset.options()).order_by(desc(Doubt.created_at))
 
     if topic:
         query = query.filter(Doubt.topic == topic)
 
     doubts = query.all()
 
+    if fieldset.sparse:
+        return sparse_response([fieldset.serialize(doubt) for doubt in doubts])
     return [DoubtDetailResponse.model_validate(doubt) for doubt in doubts]
 
 
 @router.get("/{doubt_id}", response_model=DoubtDetailResponse)
-def get_doubt(doubt_id: int, db: Session = Depends(get_db)):
-    doubt = db.query(Doubt).filter(Doubt.id == doubt_id).first()
+def get_doubt(
+    doubt_id: int,
+    fields: str = None,
+    expand: str = None,
+    db: Session = Depends(get_db),
+):
+    fieldset = doubt_fieldset(fields, expand)
+    doubt = (
+        db.query(Doubt)
+        .options(*fieldset.options())
+        .filter(Doubt.id == doubt_id)
+        .first()
+    )
 
     if not doubt:
         raise HTTPException(
@@ -54,6 +131,8 @@ def get_doubt(doubt_id: int, db: Session = Depends(get_db)):
             detail="Doubt not found",
         )
 
+    if fieldset.sparse:
+        return sparse_response(fieldset.serialize(doubt))
     return DoubtDetailResponse.model_validate(doubt)
 
 
@@ -77,7 +156,9 @@ def delete_doubt(
             detail="Can only delete your own doubts",
         )
 
+    topic_stats.add(db, doubt.topic, doubts=-1)
     db.delete(doubt)
     db.commit()
+    similar_doubts.remove(doubt_id)
 
     return {"message": "Doubt deleted successfully"}
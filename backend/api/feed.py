@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from database import get_db
+from models import User
+from schemas import FeedItemResponse, FeedResponse
+from dependencies import get_current_user
+from feed import get_feed
+
+router = APIRouter(prefix="/api/feed", tags=["feed"])
+
+
+@router.get("", response_model=FeedResponse)
+def read_feed(
+    cursor: str = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    try:
+        activities, next_cursor = get_feed(db, current_user.id, cursor=cursor, limit=limit)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+    return {
+        "items": [FeedItemResponse.model_validate(activity) for activity in activities],
+        "next_cursor": next_cursor,
+    }
@@ -1,12 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from database import get_db
 from models import Group, User, Topic, GroupResource
-from schemas import GroupCreate, GroupResponse, GroupResourceCreate
+from schemas import (
+    GroupCreate,
+    GroupResponse,
+    GroupResourceCreate,
+    GroupResourceResponse,
+    UserResponse,
+)
 from dependencies import get_current_user
+from fieldsets import FieldSet, sparse_response
+from group_counters import SORT_ORDERS
+from feed import feed_fanout, record_activity
+from topic_stats import topic_stats
 
 router = APIRouter(prefix="/api/groups", tags=["groups"])
 
+GROUP_EXPANDABLE = {"members": UserResponse, "resources": GroupResourceResponse}
+SORT_PATTERN = "^(members|recent|resources)$"
+
+
+def group_fieldset(fields: str = None, expand: str = None) -> FieldSet:
+    return FieldSet(Group, GroupResponse, GROUP_EXPANDABLE, fields, expand)
+
 
 @router.post("", response_model=GroupResponse)
 def create_group(
@@ -21,15 +39,20 @@ def create_group(
             detail="Topic not found",
         )
 
+    now = datetime.utcnow()
     new_group = Group(
         title=group_data.title,
         description=group_data.description,
         topic_id=group_data.topic_id,
         created_by=current_user.id,
+        created_at=now,
+        member_count=1,
+        last_activity_at=now,
     )
     new_group.members.append(current_user)
 
     db.add(new_group)
+    topic_stats.add(db, topic.name, groups=1, members=1)
     db.commit()
     db.refresh(new_group)
 
@@ -37,20 +60,45 @@ def create_group(
 
 
 @router.get("", response_model=list[GroupResponse])
-def list_groups(db: Session = Depends(get_db)):
-    groups = db.query(Group).all()
+def list_groups(
+    sort: str = Query(None, pattern=SORT_PATTERN),
+    fields: str = None,
+    expand: str = None,
+    db: Session = Depends(get_db),
+):
+    fieldset = group_fieldset(fields, expand)
+    query = db.query(Group).options(*fieldset.options())
+    if sort:
+        query = query.order_by(*SORT_ORDERS[sort])
+    groups = query.all()
+
+    if fieldset.sparse:
+        return sparse_response([fieldset.serialize(group) for group in groups])
     return [GroupResponse.model_validate(group) for group in groups]
 
 
 @router.get("/{group_id}", response_model=GroupResponse)
-def get_group(group_id: int, db: Session = Depends(get_db)):
-    group = db.query(Group).filter(Group.id == group_id).first()
+def get_group(
+    group_id: int,
+    fields: str = None,
+    expand: str = None,
+    db: Session = Depends(get_db),
+):
+    fieldset = group_fieldset(fields, expand)
+    group = (
+        db.query(Group)
+        .options(*fieldset.options())
+        .filter(Group.id == group_id)
+        .first()
+    )
     if not group:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Group not found",
         )
 
+    if fieldset.sparse:
+        return sparse_response(fieldset.serialize(group))
     return GroupResponse.model_validate(group)
 
 
@@ -74,7 +122,12 @@ def join_group(
         )
 
     group.members.append(current_user)
+    group.member_count = Group.member_count + 1
+    group.last_activity_at = datetime.utcnow()
+    activity = record_activity(db, group, "member", current_user.id)
+    topic_stats.add(db, group.topic.name, members=1)
     db.commit()
+    feed_fanout.enqueue(activity.id)
     db.refresh(group)
 
     return GroupResponse.model_validate(group)
@@ -100,6 +153,8 @@ def leave_group(
         )
 
     group.members.remove(current_user)
+    group.member_count = Group.member_count - 1
+    topic_stats.add(db, group.topic.name, members=-1)
     db.commit()
     db.refresh(group)
 
@@ -126,16 +181,22 @@ def add_resource(
             detail="Only group members can add resources",
         )
 
+    now = datetime.utcnow()
     new_resource = GroupResource(
         group_id=group_id,
         title=resource_data.title,
         url=resource_data.url,
         resource_type=resource_data.resource_type,
         shared_by=current_user.id,
+        created_at=now,
     )
 
     db.add(new_resource)
+    group.resource_count = Group.resource_count + 1
+    group.last_activity_at = now
+    activity = record_activity(db, group, "resource", current_user.id, resource=new_resource)
     db.commit()
+    feed_fanout.enqueue(activity.id)
     db.refresh(new_resource)
 
     return {"message": "Resource added successfully"}
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from database import get_db
+from models import Group, Topic
+from schemas import GroupResponse, TopicStatsResponse, TrendingTopicResponse
+from trending import trending_topics
+from topic_stats import topic_stats
+from fieldsets import sparse_response
+from group_counters import SORT_ORDERS
+from api.groups import SORT_PATTERN, group_fieldset
+
+router = APIRouter(prefix="/api/topics", tags=["topics"])
+
+
+@router.get("/trending", response_model=list[TrendingTopicResponse])
+def get_trending_topics(
+    window: str = Query("hour", pattern="^(hour|day)$"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    return trending_topics.top(window=window, limit=limit)
+
+
+@router.get("/{topic_id}/groups", response_model=list[GroupResponse])
+def list_topic_groups(
+    topic_id: int,
+    sort: str = Query("members", pattern=SORT_PATTERN),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    fields: str = None,
+    expand: str = None,
+    db: Session = Depends(get_db),
+):
+    if not db.query(Topic.id).filter(Topic.id == topic_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found",
+        )
+
+    fieldset = group_fieldset(fields, expand)
+    groups = (
+        db.query(Group)
+        .options(*fieldset.options())
+        .filter(Group.topic_id == topic_id)
+        .order_by(*SORT_ORDERS[sort])
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+
+    if fieldset.sparse:
+        return sparse_response([fieldset.serialize(group) for group in groups])
+    return [GroupResponse.model_validate(group) for group in groups]
+
+
+@router.get("/{topic_id}/stats", response_model=TopicStatsResponse)
+def get_topic_stats(topic_id: int, db: Session = Depends(get_db)):
+    name = topic_stats.topic_name(db, topic_id)
+    if name is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found",
+        )
+
+    return {"topic_id": topic_id, "name": name, **topic_stats.get(db, name)}
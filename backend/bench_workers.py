@@ -0,0 +1,92 @@
+"""Measure requests/sec as serve.py scales from 1 to N workers.
+
+Usage:
+    python bench_workers.py --max-workers 4 --duration 10 --path /health
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+import requests
+
+
+def wait_until_up(url: str, timeout: float = 60) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def client(url: str, duration: float) -> int:
+    session = requests.Session()
+    completed = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            if session.get(url, timeout=10).status_code < 500:
+                completed += 1
+        except requests.RequestException:
+            pass
+    return completed
+
+
+def measure(workers: int, args) -> float:
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "serve.py",
+            "--workers",
+            str(workers),
+            "--port",
+            str(args.port),
+            "--max-requests",
+            "0",
+            "--log-level",
+            "warning",
+        ],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    base = f"http://127.0.0.1:{args.port}"
+    try:
+        if not wait_until_up(f"{base}/health"):
+            raise RuntimeError(f"Server with {workers} workers did not start")
+        with multiprocessing.Pool(args.clients) as pool:
+            started = time.monotonic()
+            counts = pool.starmap(
+                client, [(f"{base}{args.path}", args.duration)] * args.clients
+            )
+            elapsed = time.monotonic() - started
+        return sum(counts) / elapsed
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark serve.py worker scaling")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=(os.cpu_count() or 1) * 2)
+    parser.add_argument("--path", default="/health")
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args(argv)
+
+    counts = sorted({1, *[2**i for i in range(1, 16) if 2**i < args.max_workers], args.max_workers})
+    baseline = None
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+    for workers in counts:
+        rate = measure(workers, args)
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>10.1f} {rate / baseline:>7.2f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
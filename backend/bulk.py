@@ -0,0 +1,321 @@
+"""Streaming bulk export/import of platform tables.
+
+Usage:
+    python bulk.py export doubts -o doubts.ndjson
+    python bulk.py export search_history --format parquet -o search_history.parquet
+    python bulk.py import doubts doubts.ndjson
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import date, datetime
+from sqlalchemy import Boolean, Date, DateTime, Integer, func, select, text
+from database import Base, engine
+import models  # noqa: F401  (registers every table on Base.metadata)
+
+FORMATS = ("ndjson", "parquet")
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_TRANSACTION_ROWS = 50000
+# Columns left out of exports unless secrets are asked for explicitly.
+SECRET_COLUMNS = {
+    "users": {"password_hash"},
+    "idempotency_keys": {"headers", "body"},
+}
+
+
+def get_table(name: str):
+    table = Base.metadata.tables.get(name)
+    if table is None:
+        raise KeyError(f"Unknown table: {name}")
+    return table
+
+
+def table_names() -> list:
+    """Exportable tables in dependency order, so importing in this order satisfies FKs"""
+    return [table.name for table in Base.metadata.sorted_tables]
+
+
+def export_columns(table, include_secrets: bool = False) -> list:
+    excluded = set() if include_secrets else SECRET_COLUMNS.get(table.name, set())
+    return [column for column in table.columns if column.name not in excluded]
+
+
+def load_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet support requires pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def iter_chunks(table, chunk_size: int = DEFAULT_CHUNK_SIZE, include_secrets: bool = False):
+    """Yield lists of row dicts using a server-side cursor, `chunk_size` rows at a time"""
+    query = select(*export_columns(table, include_secrets)).order_by(*table.primary_key.columns)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for partition in result.mappings().partitions(chunk_size):
+            yield [dict(row) for row in partition]
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _decoders(table) -> dict:
+    decoders = {}
+    for column in table.columns:
+        if isinstance(column.type, DateTime):
+            decoders[column.name] = datetime.fromisoformat
+        elif isinstance(column.type, Date):
+            decoders[column.name] = date.fromisoformat
+    return decoders
+
+
+def iter_ndjson(table, chunk_size: int = DEFAULT_CHUNK_SIZE, include_secrets: bool = False):
+    """Yield NDJSON-encoded bytes, one chunk of rows at a time"""
+    for chunk in iter_chunks(table, chunk_size, include_secrets):
+        yield "".join(
+            json.dumps({key: _encode(value) for key, value in row.items()}) + "\n"
+            for row in chunk
+        ).encode()
+
+
+def _arrow_schema(pyarrow, table, include_secrets: bool = False):
+    """Arrow schema from column types, so all-null chunks don't change inferred types"""
+    fields = []
+    for column in export_columns(table, include_secrets):
+        if isinstance(column.type, DateTime):
+            arrow_type = pyarrow.timestamp("us")
+        elif isinstance(column.type, Date):
+            arrow_type = pyarrow.date32()
+        elif isinstance(column.type, Boolean):
+            arrow_type = pyarrow.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pyarrow.int64()
+        else:
+            arrow_type = pyarrow.string()
+        fields.append(pyarrow.field(column.name, arrow_type, nullable=column.nullable))
+    return pyarrow.schema(fields)
+
+
+def write_parquet(
+    table, fileobj, chunk_size: int = DEFAULT_CHUNK_SIZE, include_secrets: bool = False
+) -> int:
+    """Write a table to Parquet one row group per chunk; returns the row count"""
+    pyarrow = load_pyarrow()
+    schema = _arrow_schema(pyarrow, table, include_secrets)
+    rows = 0
+    with pyarrow.parquet.ParquetWriter(fileobj, schema) as writer:
+        for chunk in iter_chunks(table, chunk_size, include_secrets):
+            writer.write_table(pyarrow.Table.from_pylist(chunk, schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+def read_ndjson(table, lines, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Parse NDJSON lines (str or bytes) into chunks of row dicts"""
+    decoders = _decoders(table)
+    chunk = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        row = json.loads(line)
+        for name, decode in decoders.items():
+            if row.get(name) is not None:
+                row[name] = decode(row[name])
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_parquet(fileobj, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    pyarrow = load_pyarrow()
+    parquet_file = pyarrow.parquet.ParquetFile(fileobj)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        yield batch.to_pylist()
+
+
+def _reset_sequence(conn, table):
+    """Move a PostgreSQL serial past imported ids; other backends track this themselves"""
+    columns = list(table.primary_key.columns)
+    if conn.dialect.name != "postgresql" or len(columns) != 1:
+        return
+    column = columns[0]
+    if not isinstance(column.type, Integer):
+        return
+    max_id = conn.execute(select(func.max(column))).scalar()
+    if max_id is not None:
+        conn.execute(
+            text("SELECT setval(pg_get_serial_sequence(:table, :column), :value)"),
+            {"table": table.name, "column": column.name, "value": max_id},
+        )
+
+
+class BulkImportError(Exception):
+    """An import that failed part way; the first `committed_rows` input rows are stored"""
+
+    def __init__(self, table: str, committed_rows: int, failed_at_row: int, cause: Exception):
+        self.table = table
+        self.committed_rows = committed_rows
+        self.failed_at_row = failed_at_row
+        super().__init__(
+            f"Import of {table} failed in the batch starting at row {failed_at_row}: {cause}. "
+            f"The first {committed_rows} rows are committed; retry with skip_rows={committed_rows}"
+        )
+
+
+def import_chunks(
+    table,
+    chunks,
+    transaction_rows: int = DEFAULT_TRANSACTION_ROWS,
+    skip_rows: int = 0,
+) -> dict:
+    """Insert chunks with executemany, committing every `transaction_rows` rows.
+
+    The first `skip_rows` input rows are skipped, so a failed import can be
+    resumed from the committed_rows reported by BulkImportError.
+    """
+    started = time.perf_counter()
+    total = 0
+    pending = 0
+    offset = 0  # input rows consumed, including skipped ones
+    committed = 0
+    failed_at = 0  # start of the chunk being read or inserted
+
+    conn = engine.connect()
+    try:
+        trans = conn.begin()
+        for chunk in chunks:
+            chunk_start = offset
+            offset += len(chunk)
+            if offset <= skip_rows:
+                committed = failed_at = offset
+                continue
+            if chunk_start < skip_rows:
+                chunk = chunk[skip_rows - chunk_start :]
+                chunk_start = committed = skip_rows
+            if not chunk:
+                continue
+            failed_at = chunk_start
+            conn.execute(table.insert(), chunk)
+            failed_at = offset
+            total += len(chunk)
+            pending += len(chunk)
+            if pending >= transaction_rows:
+                trans.commit()
+                committed = offset
+                trans = conn.begin()
+                pending = 0
+        _reset_sequence(conn, table)
+        trans.commit()
+    except Exception as e:
+        if conn.in_transaction():
+            conn.rollback()
+        raise BulkImportError(table.name, committed, failed_at, e) from e
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "table": table.name,
+        "rows": total,
+        "skipped": min(skip_rows, offset),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(total / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk export/import LearnConnect tables")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Stream a table to NDJSON or Parquet")
+    export_parser.add_argument("table", choices=table_names())
+    export_parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    export_parser.add_argument("-o", "--output", help="Output file (default: stdout, NDJSON only)")
+    export_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    export_parser.add_argument(
+        "--include-secrets",
+        action="store_true",
+        help="Also export secret columns (e.g. users.password_hash), for full restores",
+    )
+
+    import_parser = subparsers.add_parser("import", help="Bulk insert NDJSON or Parquet rows")
+    import_parser.add_argument("table", choices=table_names())
+    import_parser.add_argument("input", help="Input file ('-' for stdin, NDJSON only)")
+    import_parser.add_argument("--format", choices=FORMATS, default=None)
+    import_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    import_parser.add_argument("--transaction-rows", type=int, default=DEFAULT_TRANSACTION_ROWS)
+    import_parser.add_argument(
+        "--skip-rows",
+        type=int,
+        default=0,
+        help="Skip this many input rows, to resume a failed import",
+    )
+
+    args = parser.parse_args(argv)
+    Base.metadata.create_all(bind=engine)
+    table = get_table(args.table)
+
+    if args.command == "export":
+        started = time.perf_counter()
+        if args.format == "parquet":
+            if not args.output:
+                parser.error("--output is required for parquet exports")
+            rows = write_parquet(table, args.output, args.chunk_size, args.include_secrets)
+        else:
+            out = open(args.output, "wb") if args.output else sys.stdout.buffer
+            rows = 0
+            try:
+                for data in iter_ndjson(table, args.chunk_size, args.include_secrets):
+                    out.write(data)
+                    rows += data.count(b"\n")
+            finally:
+                if args.output:
+                    out.close()
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed > 0 else 0
+        print(f"✓ Exported {rows} {table.name} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)", file=sys.stderr)
+        return
+
+    fmt = args.format or ("parquet" if args.input.endswith(".parquet") else "ndjson")
+    try:
+        if fmt == "parquet":
+            stats = import_chunks(
+                table,
+                read_parquet(args.input, args.chunk_size),
+                args.transaction_rows,
+                args.skip_rows,
+            )
+        else:
+            source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+            try:
+                stats = import_chunks(
+                    table,
+                    read_ndjson(table, source, args.chunk_size),
+                    args.transaction_rows,
+                    args.skip_rows,
+                )
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+    except BulkImportError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        sys.exit(1)
+    print(
+        f"✓ Imported {stats['rows']} {table.name} rows in {stats['seconds']}s "
+        f"({stats['rows_per_sec']} rows/sec)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,15 @@ import json
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./learnconnect.db"
+    # Admission limits are scaled down to fit the pool, so these cover the
+    # default ADMISSION_* concurrency (38) plus background jobs.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 32
+    # Total connections across all workers; serve.py splits it per worker
+    DB_CONNECTION_BUDGET: int = 40
+
+    # Only one worker should run background jobs (compaction, index saves)
+    RUN_BACKGROUND_JOBS: bool = True
 
     # JWT
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -16,6 +25,83 @@ class Settings(BaseSettings):
     YOUTUBE_API_KEY: str = ""
     BING_SEARCH_API_KEY: str = ""
 
+    # Admin access (users allowed to call /api/admin endpoints)
+    ADMIN_EMAILS: list = []
+
+    # Trending topics
+    TRENDING_BUCKET_SECONDS: int = 300
+    TRENDING_CAPACITY: int = 100
+    # Each worker counts searches by reading new search_history rows this often,
+    # re-reading this far back to catch transactions that committed late.
+    TRENDING_SYNC_SECONDS: int = 10
+    TRENDING_SYNC_LAG_SECONDS: int = 60
+
+    # Search history compaction
+    SEARCH_HISTORY_RETENTION_DAYS: int = 30
+    SEARCH_COMPACTION_BATCH_SIZE: int = 500
+    SEARCH_COMPACTION_INTERVAL_SECONDS: int = 3600
+
+    # Similar doubt detection (MinHash LSH)
+    SIMILAR_DOUBTS_INDEX_PATH: str = "./similar_doubts.npz"
+    # 32 bands of 2 rows: pairs become candidates half the time at J ~= 0.18,
+    # well below the thresholds, so scoring rather than banding decides matches.
+    SIMILAR_DOUBTS_NUM_PERM: int = 64
+    SIMILAR_DOUBTS_BANDS: int = 32
+    # Estimates from 64 perms are within ~0.06 of the true Jaccard, so this sits
+    # below 0.5 to reliably catch pairs that share about half their shingles.
+    SIMILAR_DOUBTS_THRESHOLD: float = 0.4
+    # Free-text lookups score by containment of the query in the doubt.
+    SIMILAR_DOUBTS_QUERY_THRESHOLD: float = 0.6
+    # How often each worker picks up doubts created or deleted by other workers
+    SIMILAR_DOUBTS_SYNC_SECONDS: int = 60
+
+    # Admission control: per route class (concurrent requests, max queued requests)
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    ADMISSION_READ_CONCURRENCY: int = 16
+    ADMISSION_READ_QUEUE: int = 64
+    ADMISSION_WRITE_CONCURRENCY: int = 8
+    ADMISSION_WRITE_QUEUE: int = 32
+    ADMISSION_AUTH_CONCURRENCY: int = 4
+    ADMISSION_AUTH_QUEUE: int = 16
+    ADMISSION_SEARCH_CONCURRENCY: int = 8
+    ADMISSION_SEARCH_QUEUE: int = 32
+    ADMISSION_ADMIN_CONCURRENCY: int = 2
+    ADMISSION_ADMIN_QUEUE: int = 4
+
+    # Activity feed: groups above this size are read at query time instead of fanned out
+    FEED_FANOUT_MAX_MEMBERS: int = 1000
+    FEED_FANOUT_BATCH_SIZE: int = 500
+
+    # Per-topic statistics (counted in the database, recomputed by the primary worker)
+    TOPIC_STATS_RECONCILE_SECONDS: int = 300
+
+    # Search result cache and refresh-ahead warmer
+    SEARCH_CACHE_TTL_SECONDS: int = 900
+    SEARCH_CACHE_MAX_ENTRIES: int = 1000
+    SEARCH_WARMER_ENABLED: bool = True
+    SEARCH_WARMER_TOP_N: int = 50
+    SEARCH_WARMER_REFRESH_AHEAD_SECONDS: int = 120
+    SEARCH_WARMER_INTERVAL_SECONDS: int = 15
+    SEARCH_WARMER_POPULARITY_SECONDS: int = 300
+    SEARCH_WARMER_CALLS_PER_MINUTE: int = 60
+    SEARCH_PROVIDER_FAILURE_THRESHOLD: int = 3
+    SEARCH_PROVIDER_COOLDOWN_SECONDS: int = 60
+
+    # Idempotency-Key support for retried writes
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_MAX_KEYS: int = 10000
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0
+    # A first attempt that hasn't finished after this long (e.g. its worker died) stops blocking the key
+    IDEMPOTENCY_IN_FLIGHT_SECONDS: int = 300
+
+    # Request profiling (X-Profile header from admins, or random sampling)
+    PROFILING_ENABLED: bool = True
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5.0
+    PROFILE_DIR: str = "./profiles"
+    PROFILE_MAX_STORED: int = 200
+
     # CORS
     CORS_ORIGINS: list = ["http://localhost:5173", "http://localhost:3000"]
 
@@ -30,6 +116,11 @@ class Settings(BaseSettings):
                 self.CORS_ORIGINS = json.loads(self.CORS_ORIGINS)
             except (json.JSONDecodeError, TypeError):
                 self.CORS_ORIGINS = ["http://localhost:5173", "http://localhost:3000"]
+        if isinstance(self.ADMIN_EMAILS, str):
+            try:
+                self.ADMIN_EMAILS = json.loads(self.ADMIN_EMAILS)
+            except (json.JSONDecodeError, TypeError):
+                self.ADMIN_EMAILS = []
 
 
 @lru_cache()
@@ -1,13 +1,23 @@
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 from config import get_settings
+from profiling import current_profile
 
 settings = get_settings()
 
+pool_args = (
+    {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW}
+    if ":memory:" not in settings.DATABASE_URL
+    else {}
+)
+# Most connections the pool will hand out at once (None when unbounded).
+pool_capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW if pool_args else None
+
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
     echo=False,
+    **pool_args,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -16,7 +26,8 @@ Base = declarative_base()
 
 
 def get_db():
-    db = SessionLocal()
+    profile = current_profile.get()
+    db = SessionLocal(bind=profile.bind(engine)) if profile else SessionLocal()
     try:
         yield db
     finally:
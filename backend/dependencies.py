@@ -4,8 +4,10 @@ from sqlalchemy.orm import Session
 from database import get_db
 from models import User
 from auth import decode_token
+from config import get_settings
 
 security = HTTPBearer()
+settings = get_settings()
 
 
 def get_current_user(
@@ -39,3 +41,13 @@ def get_current_user(
         )
 
     return user
+
+
+def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.email not in settings.ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+
+    return current_user
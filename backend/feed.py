@@ -0,0 +1,225 @@
+import base64
+import queue
+import threading
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import and_, desc, exists, false, insert, inspect, or_, select, text
+from sqlalchemy.orm import Session, selectinload
+from config import get_settings
+from database import SessionLocal, engine
+from models import Group, GroupActivity, TimelineEntry, group_members
+
+settings = get_settings()
+
+
+def ensure_activity_columns() -> bool:
+    """Add fanout_on_read to a pre-existing group_activities table.
+
+    Older rows are marked as read-on-fan-out when they were never copied to
+    any timeline and their group is currently large, which is what get_feed
+    assumed for them before the column existed. Returns True if it was added.
+    """
+    existing = {column["name"] for column in inspect(engine).get_columns("group_activities")}
+    if "fanout_on_read" in existing:
+        return False
+
+    column = GroupActivity.__table__.c.fanout_on_read
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "ALTER TABLE group_activities ADD COLUMN fanout_on_read "
+                f"{column.type.compile(dialect=engine.dialect)} NOT NULL "
+                f"DEFAULT {false().compile(dialect=engine.dialect)}"
+            )
+        )
+        large_groups = select(Group.id).where(Group.member_count > settings.FEED_FANOUT_MAX_MEMBERS)
+        copied = exists().where(TimelineEntry.activity_id == GroupActivity.id)
+        conn.execute(
+            GroupActivity.__table__.update()
+            .where(
+                GroupActivity.group_id.in_(large_groups),
+                GroupActivity.fanned_out.is_(True),
+                ~copied,
+            )
+            .values(fanout_on_read=True)
+        )
+    return True
+
+
+def record_activity(db: Session, group: Group, kind: str, actor_id: int, resource=None):
+    """Add a feed event to the current transaction; call feed_fanout.enqueue after commit"""
+    activity = GroupActivity(
+        group_id=group.id,
+        kind=kind,
+        actor_id=actor_id,
+        resource=resource,
+        created_at=resource.created_at if resource is not None else datetime.utcnow(),
+    )
+    db.add(activity)
+    return activity
+
+
+def encode_cursor(created_at: datetime, activity_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{activity_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, activity_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(activity_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def _before(created_at_column, id_column, cursor):
+    created_at, activity_id = cursor
+    return or_(
+        created_at_column < created_at,
+        and_(created_at_column == created_at, id_column < activity_id),
+    )
+
+
+def get_feed(db: Session, user_id: int, cursor: Optional[str] = None, limit: int = 20):
+    """Merge the user's fanned-out timeline with activity read from their groups.
+
+    Activity that was too large to fan out is read from every group the user
+    belongs to, whatever the group's size is now.
+
+    Returns (activities, next_cursor), newest first.
+    """
+    position = decode_cursor(cursor) if cursor else None
+
+    timeline = (
+        db.query(GroupActivity)
+        .join(TimelineEntry, TimelineEntry.activity_id == GroupActivity.id)
+        .filter(TimelineEntry.user_id == user_id)
+    )
+    if position:
+        timeline = timeline.filter(
+            _before(TimelineEntry.created_at, TimelineEntry.activity_id, position)
+        )
+    activities = (
+        timeline.options(selectinload(GroupActivity.resource))
+        .order_by(desc(TimelineEntry.created_at), desc(TimelineEntry.activity_id))
+        .limit(limit + 1)
+        .all()
+    )
+
+    user_groups = db.query(group_members.c.group_id).filter(group_members.c.user_id == user_id)
+    pulled = db.query(GroupActivity).filter(
+        GroupActivity.group_id.in_(user_groups),
+        GroupActivity.fanout_on_read.is_(True),
+        GroupActivity.actor_id != user_id,
+    )
+    if position:
+        pulled = pulled.filter(_before(GroupActivity.created_at, GroupActivity.id, position))
+    activities.extend(
+        pulled.options(selectinload(GroupActivity.resource))
+        .order_by(desc(GroupActivity.created_at), desc(GroupActivity.id))
+        .limit(limit + 1)
+        .all()
+    )
+
+    merged = sorted(
+        {activity.id: activity for activity in activities}.values(),
+        key=lambda activity: (activity.created_at, activity.id),
+        reverse=True,
+    )
+    page = merged[:limit]
+    next_cursor = None
+    if len(merged) > limit:
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+    return page, next_cursor
+
+
+class FeedFanout:
+    """Copies group activity into members' timelines on a background thread"""
+
+    def __init__(self, batch_size: int, max_members: int):
+        self.batch_size = batch_size
+        self.max_members = max_members
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def enqueue(self, activity_id: int):
+        self.queue.put(activity_id)
+
+    def fan_out(self, db: Session, activity_id: int):
+        activity = db.get(GroupActivity, activity_id)
+        if activity is None or activity.fanned_out:
+            return
+
+        # Large groups are served by fan-out-on-read in get_feed instead. The
+        # choice is stored so a later change in group size can't hide it.
+        activity.fanout_on_read = activity.group.member_count > self.max_members
+        if not activity.fanout_on_read:
+            member_ids = (
+                db.query(group_members.c.user_id)
+                .filter(
+                    group_members.c.group_id == activity.group_id,
+                    group_members.c.user_id != activity.actor_id,
+                )
+                .all()
+            )
+            for start in range(0, len(member_ids), self.batch_size):
+                db.execute(
+                    insert(TimelineEntry),
+                    [
+                        {
+                            "user_id": user_id,
+                            "activity_id": activity.id,
+                            "created_at": activity.created_at,
+                        }
+                        for (user_id,) in member_ids[start : start + self.batch_size]
+                    ],
+                )
+
+        activity.fanned_out = True
+        db.commit()
+
+    def resume_pending(self):
+        """Re-queue activities whose fan-out was interrupted (e.g. by a restart)"""
+        db = SessionLocal()
+        try:
+            pending = (
+                db.query(GroupActivity.id)
+                .filter(GroupActivity.fanned_out.is_(False))
+                .order_by(GroupActivity.id)
+                .all()
+            )
+        finally:
+            db.close()
+        for (activity_id,) in pending:
+            self.enqueue(activity_id)
+
+    def _loop(self):
+        while True:
+            activity_id = self.queue.get()
+            if activity_id is None:
+                return
+            db = SessionLocal()
+            try:
+                self.fan_out(db, activity_id)
+            except Exception as e:
+                db.rollback()
+                print(f"Feed fan-out error for activity {activity_id}: {e}")
+            finally:
+                db.close()
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._loop, name="feed-fanout", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout=5)
+
+
+feed_fanout = FeedFanout(
+    batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+    max_members=settings.FEED_FANOUT_MAX_MEMBERS,
+)
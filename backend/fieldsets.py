@@ -0,0 +1,82 @@
+from typing import Optional
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import load_only, selectinload
+
+
+def parse_field_list(value: Optional[str], allowed, param: str) -> Optional[set]:
+    """Parse a comma separated `fields=`/`expand=` value, rejecting unknown names"""
+    if value is None:
+        return None
+
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = names - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown {param}: {', '.join(sorted(unknown))}",
+        )
+    return names
+
+
+class FieldSet:
+    """Column projection and relationship expansion for a model read.
+
+    Columns are the schema fields that aren't relationships; `expandable`
+    maps relationship names to the schema used to serialize them. Without
+    `fields` or `expand` the full schema is returned as before. Otherwise only
+    the requested columns are loaded (plus the primary key) and only the
+    requested relationships are fetched.
+    """
+
+    def __init__(
+        self,
+        model,
+        schema,
+        expandable: dict,
+        fields: Optional[str] = None,
+        expand: Optional[str] = None,
+    ):
+        self.model = model
+        self.expandable = expandable
+
+        columns = [name for name in schema.model_fields if name not in expandable]
+        requested = parse_field_list(fields, columns, "fields")
+        expanded = parse_field_list(expand, expandable, "expand")
+
+        self.sparse = requested is not None or expanded is not None
+        if requested is None:
+            self.columns = columns
+        else:
+            self.columns = [name for name in columns if name in requested or name == "id"]
+        if not self.sparse:
+            self.relations = list(expandable)
+        else:
+            self.relations = [name for name in expandable if name in (expanded or ())]
+
+    def options(self) -> list:
+        if not self.sparse:
+            return []
+
+        options = [load_only(*[getattr(self.model, name) for name in self.columns])]
+        options.extend(selectinload(getattr(self.model, name)) for name in self.relations)
+        return options
+
+    def serialize(self, obj) -> dict:
+        data = {name: getattr(obj, name) for name in self.columns}
+        for name in self.relations:
+            schema = self.expandable[name]
+            value = getattr(obj, name)
+            if isinstance(value, list):
+                data[name] = [schema.model_validate(item).model_dump() for item in value]
+            elif value is not None:
+                data[name] = schema.model_validate(value).model_dump()
+            else:
+                data[name] = None
+        return data
+
+
+def sparse_response(content) -> JSONResponse:
+    """Return a partial payload directly, bypassing full response_model validation"""
+    return JSONResponse(content=jsonable_encoder(content))
@@ -0,0 +1,145 @@
+"""Consistency checks for the denormalized Group counters.
+
+Usage:
+    python group_counters.py          # report mismatches
+    python group_counters.py --fix    # recompute and store the correct values
+"""
+import argparse
+from sqlalchemy import func, inspect, text
+from sqlalchemy.orm import Session
+from database import Base, SessionLocal, engine
+from models import Group, GroupResource, group_members
+
+COUNTER_COLUMNS = ("member_count", "resource_count", "last_activity_at")
+SORT_ORDERS = {
+    "members": (Group.member_count.desc(), Group.id.desc()),
+    "recent": (Group.last_activity_at.desc(), Group.id.desc()),
+    "resources": (Group.resource_count.desc(), Group.id.desc()),
+}
+
+
+def ensure_counter_columns() -> bool:
+    """Add the counter columns and indexes to a pre-existing groups table.
+
+    create_all only creates missing tables, so databases created before the
+    counters existed need the columns added in place. Returns True when
+    columns were added and the counters still need backfilling.
+    """
+    existing = {column["name"] for column in inspect(engine).get_columns("groups")}
+    missing = [name for name in COUNTER_COLUMNS if name not in existing]
+
+    with engine.begin() as conn:
+        for name in missing:
+            column = Group.__table__.c[name]
+            ddl = f"ALTER TABLE groups ADD COLUMN {name} {column.type.compile(dialect=engine.dialect)}"
+            if column.server_default is not None:
+                ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+            conn.execute(text(ddl))
+    for index in Group.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    return bool(missing)
+
+
+def check_group_counters(db: Session, fix: bool = False, batch_size: int = 500) -> dict:
+    """Recompute every group's counters from group_members and group_resources.
+
+    last_activity_at can't be fully recomputed because joins aren't
+    timestamped, so it is only corrected when it is missing or older than the
+    group's latest resource.
+    """
+    members = (
+        db.query(group_members.c.group_id, func.count().label("count"))
+        .group_by(group_members.c.group_id)
+        .subquery()
+    )
+    resources = (
+        db.query(
+            GroupResource.group_id,
+            func.count(GroupResource.id).label("count"),
+            func.max(GroupResource.created_at).label("latest"),
+        )
+        .group_by(GroupResource.group_id)
+        .subquery()
+    )
+    rows = (
+        db.query(
+            Group.id,
+            Group.member_count,
+            Group.resource_count,
+            Group.last_activity_at,
+            Group.created_at,
+            func.coalesce(members.c.count, 0),
+            func.coalesce(resources.c.count, 0),
+            resources.c.latest,
+        )
+        .outerjoin(members, members.c.group_id == Group.id)
+        .outerjoin(resources, resources.c.group_id == Group.id)
+        .order_by(Group.id)
+        .all()
+    )
+
+    updates = []
+    for (
+        group_id,
+        member_count,
+        resource_count,
+        last_activity_at,
+        created_at,
+        actual_members,
+        actual_resources,
+        latest_resource,
+    ) in rows:
+        floor = max(filter(None, (created_at, latest_resource)), default=None)
+        expected_activity = last_activity_at
+        if floor and (last_activity_at is None or last_activity_at < floor):
+            expected_activity = floor
+
+        if (member_count, resource_count, last_activity_at) != (
+            actual_members,
+            actual_resources,
+            expected_activity,
+        ):
+            updates.append(
+                {
+                    "id": group_id,
+                    "member_count": actual_members,
+                    "resource_count": actual_resources,
+                    "last_activity_at": expected_activity,
+                }
+            )
+
+    if fix:
+        for start in range(0, len(updates), batch_size):
+            db.bulk_update_mappings(Group, updates[start : start + batch_size])
+            db.commit()
+
+    return {
+        "checked": len(rows),
+        "mismatched": len(updates),
+        "fixed": fix,
+        "group_ids": [update["id"] for update in updates],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check denormalized group counters")
+    parser.add_argument("--fix", action="store_true", help="Write the recomputed values")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    ensure_counter_columns()
+    db = SessionLocal()
+    try:
+        result = check_group_counters(db, fix=args.fix)
+    finally:
+        db.close()
+
+    action = "Fixed" if args.fix else "Found"
+    print(f"✓ Checked {result['checked']} groups. {action} {result['mismatched']} mismatched")
+    if result["group_ids"]:
+        print("Group ids:", ", ".join(str(group_id) for group_id in result["group_ids"]))
+
+
+if __name__ == "__main__":
+    main()
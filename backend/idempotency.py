@@ -0,0 +1,356 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+from anyio import to_thread
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from auth import decode_token
+from config import get_settings
+from database import SessionLocal
+from models import IdempotencyKey
+
+settings = get_settings()
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# POST routes that honour Idempotency-Key.
+IDEMPOTENT_PATHS = re.compile(r"^/api/(doubts|groups|groups/\d+/(join|resources))/?$")
+# How often a duplicate re-checks a first attempt running in another worker
+POLL_SECONDS = 0.1
+PURGE_INTERVAL_SECONDS = 60
+
+
+def _key_hash(key) -> str:
+    subject, path, idempotency_key = key
+    return hashlib.sha256(f"{subject}\0{path}\0".encode() + idempotency_key).hexdigest()
+
+
+class IdempotencyRecord:
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = asyncio.Event()
+        self.response = None  # (status, headers, body) once the original completes
+        self.expires_at = None
+
+
+class IdempotencyStore:
+    """Keys shared by every worker in the idempotency_keys table, with a local cache.
+
+    A first attempt claims its key by inserting an in-flight row, so a
+    duplicate sent to any worker finds it. The bounded, TTL-evicted map of
+    (user, path, key) lets duplicates that reach the same worker wait on or
+    replay the first attempt without a query; it is only touched from the
+    event loop, so it needs no locking. The table methods are blocking and
+    run in a worker thread.
+    """
+
+    def __init__(self, ttl_seconds: int, max_keys: int, in_flight_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self.in_flight_seconds = in_flight_seconds
+        self.records = OrderedDict()
+        self.purged_at = 0.0
+
+        self.started = 0
+        self.replayed = 0
+        self.waited = 0
+
+    def evict(self):
+        """Drop expired records from the front, then the oldest ones to make room"""
+        now = time.monotonic()
+        while self.records:
+            record = next(iter(self.records.values()))
+            if record.expires_at is None or record.expires_at > now:
+                break
+            self.records.popitem(last=False)
+        while len(self.records) >= self.max_keys:
+            self.records.popitem(last=False)
+
+    def get(self, key) -> Optional[IdempotencyRecord]:
+        record = self.records.get(key)
+        if record is not None and record.expires_at is not None and record.expires_at <= time.monotonic():
+            del self.records[key]
+            return None
+        return record
+
+    def begin(self, key, fingerprint: str) -> IdempotencyRecord:
+        self.evict()
+        record = IdempotencyRecord(fingerprint)
+        self.records[key] = record
+        self.started += 1
+        return record
+
+    def complete(self, key, record: IdempotencyRecord, response):
+        record.response = response
+        record.expires_at = time.monotonic() + self.ttl_seconds
+        self.records[key] = record
+        self.records.move_to_end(key)
+        record.done.set()
+
+    def discard(self, key, record: IdempotencyRecord):
+        """Forget a failed attempt so the next retry runs again"""
+        if self.records.get(key) is record:
+            del self.records[key]
+        record.done.set()
+
+    # Shared table
+
+    def claim(self, key, fingerprint: str):
+        """Try to become the first attempt for key.
+
+        Returns ("claimed", None), ("mismatch", None), ("busy", None) while
+        another attempt runs, or ("done", response) with the stored response.
+        """
+        key_hash = _key_hash(key)
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            self._purge(db, now)
+            for _ in range(2):
+                try:
+                    db.add(
+                        IdempotencyKey(
+                            key_hash=key_hash,
+                            fingerprint=fingerprint,
+                            expires_at=now + timedelta(seconds=self.in_flight_seconds),
+                        )
+                    )
+                    db.commit()
+                    return "claimed", None
+                except IntegrityError:
+                    db.rollback()
+
+                row = db.get(IdempotencyKey, key_hash)
+                if row is None:
+                    continue
+                if row.expires_at <= now:
+                    db.query(IdempotencyKey).filter(
+                        IdempotencyKey.key_hash == key_hash, IdempotencyKey.expires_at <= now
+                    ).delete()
+                    db.commit()
+                    continue
+                if row.fingerprint != fingerprint:
+                    return "mismatch", None
+                if row.status_code is None:
+                    return "busy", None
+                headers = [
+                    (name.encode("latin-1"), value.encode("latin-1"))
+                    for name, value in json.loads(row.headers)
+                ]
+                return "done", (row.status_code, headers, row.body)
+            return "busy", None
+        finally:
+            db.close()
+
+    def store_response(self, key, response):
+        status_code, headers, body = response
+        db = SessionLocal()
+        try:
+            db.query(IdempotencyKey).filter(IdempotencyKey.key_hash == _key_hash(key)).update(
+                {
+                    "status_code": status_code,
+                    "headers": json.dumps(
+                        [(name.decode("latin-1"), value.decode("latin-1")) for name, value in headers]
+                    ),
+                    "body": body,
+                    "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+                }
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def release(self, key):
+        """Drop an unfinished claim so the next retry runs again"""
+        db = SessionLocal()
+        try:
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.key_hash == _key_hash(key), IdempotencyKey.status_code.is_(None)
+            ).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def _purge(self, db, now: datetime):
+        if time.monotonic() - self.purged_at < PURGE_INTERVAL_SECONDS:
+            return
+        self.purged_at = time.monotonic()
+        db.query(IdempotencyKey).filter(IdempotencyKey.expires_at <= now).delete()
+        db.commit()
+
+    def snapshot(self) -> dict:
+        return {
+            "keys": len(self.records),
+            "started": self.started,
+            "replayed": self.replayed,
+            "waited": self.waited,
+        }
+
+
+def _error(status_code: int, detail: str) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status_code)
+
+
+MISMATCH_DETAIL = "Idempotency-Key was already used with a different request"
+IN_PROGRESS_DETAIL = "A request with this Idempotency-Key is still in progress"
+
+
+async def _replay(send, response):
+    status_code, headers, content = response
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": headers + [(b"idempotent-replayed", b"true")],
+        }
+    )
+    await send({"type": "http.response.body", "body": content})
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware that runs each Idempotency-Key once and replays its response.
+
+    Keys are scoped to the caller's token subject and the path, and are
+    claimed in the shared idempotency_keys table, so a duplicate is caught
+    whichever worker it reaches. Duplicates that arrive while the original
+    is running wait for it; responses with a 5xx status are not stored, so
+    those can be retried.
+    """
+
+    def __init__(self, app, store: IdempotencyStore, wait_seconds: float):
+        self.app = app
+        self.store = store
+        self.wait_seconds = wait_seconds
+
+    def request_key(self, scope):
+        if scope["method"] != "POST" or not IDEMPOTENT_PATHS.match(scope["path"]):
+            return None, None
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is None:
+            return None, None
+
+        scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+        payload = decode_token(token) if scheme.lower() == "bearer" and token else None
+        if not payload or not payload.get("sub"):
+            # Let the endpoint reject the request as unauthenticated.
+            return None, None
+        return (payload["sub"], scope["path"].rstrip("/"), idempotency_key), idempotency_key
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        key, idempotency_key = self.request_key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await _error(400, "Invalid Idempotency-Key header")(scope, receive, send)
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        while True:
+            record = self.store.get(key)
+            if record is None:
+                break
+            if record.fingerprint != fingerprint:
+                await _error(422, MISMATCH_DETAIL)(scope, receive, send)
+                return
+            if record.response is None:
+                self.store.waited += 1
+                try:
+                    await asyncio.wait_for(record.done.wait(), self.wait_seconds)
+                except asyncio.TimeoutError:
+                    await _error(409, IN_PROGRESS_DETAIL)(scope, receive, send)
+                    return
+                # The original either stored a response or was discarded; look again.
+                continue
+
+            self.store.replayed += 1
+            await _replay(send, record.response)
+            return
+
+        # Local duplicates wait on this record while the key is claimed.
+        record = self.store.begin(key, fingerprint)
+        deadline = time.monotonic() + self.wait_seconds
+        polls = 0
+        while True:
+            try:
+                outcome, stored = await to_thread.run_sync(self.store.claim, key, fingerprint)
+            except Exception:
+                self.store.discard(key, record)
+                raise
+            if outcome == "claimed":
+                break
+            if outcome == "done":
+                self.store.complete(key, record, stored)
+                self.store.replayed += 1
+                await _replay(send, stored)
+                return
+            if outcome == "mismatch" or time.monotonic() >= deadline:
+                self.store.discard(key, record)
+                if outcome == "mismatch":
+                    await _error(422, MISMATCH_DETAIL)(scope, receive, send)
+                else:
+                    await _error(409, IN_PROGRESS_DETAIL)(scope, receive, send)
+                return
+            # Running in another worker; poll until it stores a response or gives up.
+            if polls == 0:
+                self.store.waited += 1
+            polls += 1
+            await asyncio.sleep(POLL_SECONDS)
+
+        response = {"status": None, "headers": [], "body": b""}
+        body_sent = False
+
+        async def replay_body():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, send_and_record)
+        finally:
+            if response["status"] is not None and response["status"] < 500:
+                outcome = (response["status"], response["headers"], response["body"])
+                self.store.complete(key, record, outcome)
+                sync = to_thread.run_sync(self.store.store_response, key, outcome)
+            else:
+                self.store.discard(key, record)
+                sync = to_thread.run_sync(self.store.release, key)
+            try:
+                await sync
+            except Exception as e:
+                print(f"Error saving Idempotency-Key outcome: {e}")
+
+
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    max_keys=settings.IDEMPOTENCY_MAX_KEYS,
+    in_flight_seconds=settings.IDEMPOTENCY_IN_FLIGHT_SECONDS,
+)
@@ -1,10 +1,23 @@
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database import engine, Base, SessionLocal
 from config import get_settings
-from api import auth, groups, search, dashboard, doubts
+from api import auth, groups, search, dashboard, doubts, topics, admin, feed
 from models import User
 from auth import get_password_hash
+from trending import rebuild_trending
+from search_history import ensure_search_history_indexes, search_history_compactor
+from similar_doubts import load_similar_doubts, save_similar_doubts
+from group_counters import ensure_counter_columns, check_group_counters
+from admission import AdmissionControlMiddleware, admission_controller
+from feed import ensure_activity_columns, feed_fanout
+from topic_stats import topic_stats
+from state_sync import state_sync
+from profiling import ProfilingMiddleware, profile_store
+from search_cache import search_cache, search_warmer
+from search_providers import provider_health
+from idempotency import IdempotencyMiddleware, idempotency_store
 
 settings = get_settings()
 
@@ -34,12 +47,114 @@ def create_default_user():
     finally:
         db.close()
 
+
+def migrate_group_counters():
+    """Add and backfill the denormalized group counters on older databases"""
+    db = SessionLocal()
+    try:
+        if ensure_counter_columns():
+            result = check_group_counters(db, fix=True)
+            print(f"✓ Backfilled counters for {result['checked']} groups")
+    except Exception as e:
+        print(f"Error migrating group counters: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def migrate_feed_activities():
+    """Add the fan-out mode column to group activities on older databases"""
+    try:
+        if ensure_activity_columns():
+            print("✓ Added fanout_on_read to group activities")
+    except Exception as e:
+        print(f"Error migrating group activities: {e}")
+
+
+def migrate_search_history_indexes():
+    """Add indexes introduced after search_history was created"""
+    try:
+        ensure_search_history_indexes()
+    except Exception as e:
+        print(f"Error migrating search history indexes: {e}")
+
+
+def load_trending_topics():
+    """Rebuild the in-memory trending counter from recent search history"""
+    db = SessionLocal()
+    try:
+        rebuild_trending(db)
+    except Exception as e:
+        print(f"Error rebuilding trending topics: {e}")
+    finally:
+        db.close()
+
+
+def load_topic_stats():
+    """Fill the per-topic counters from the source tables on first run"""
+    db = SessionLocal()
+    try:
+        if topic_stats.is_empty(db):
+            topic_stats.reconcile(db)
+    except Exception as e:
+        print(f"Error loading topic stats: {e}")
+    finally:
+        db.close()
+
+
+def load_similar_doubts_index():
+    """Load the similar-doubt index from disk and sync it with the doubts table"""
+    db = SessionLocal()
+    try:
+        load_similar_doubts(db)
+    except Exception as e:
+        print(f"Error loading similar doubts index: {e}")
+    finally:
+        db.close()
+
+
+preloaded = False
+
+
+def preload():
+    """Set up the schema and load in-memory state.
+
+    serve.py calls this in the master before forking, so workers inherit the
+    loaded state instead of each rebuilding it, and only catch up on startup.
+    """
+    global preloaded
+    migrate_group_counters()
+    migrate_feed_activities()
+    migrate_search_history_indexes()
+    create_default_user()
+    load_trending_topics()
+    load_similar_doubts_index()
+    load_topic_stats()
+    preloaded = True
+
 app = FastAPI(
     title="LearnConnect API",
     description="A collaborative learning platform API",
     version="1.0.0",
 )
 
+if settings.PROFILING_ENABLED:
+    # Innermost, so a profile covers the handler and not time spent queued.
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        sample_rate=settings.PROFILE_SAMPLE_RATE,
+        interval=settings.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+    )
+# Added before CORS so CORS stays outermost and 503s still carry CORS headers.
+app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
+# Outside admission control, so replays and duplicates waiting on an in-flight
+# original don't hold a slot.
+app.add_middleware(
+    IdempotencyMiddleware,
+    store=idempotency_store,
+    wait_seconds=settings.IDEMPOTENCY_WAIT_SECONDS,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
@@ -53,11 +168,50 @@ app.include_router(groups.router)
 app.include_router(search.router)
 app.include_router(dashboard.router)
 app.include_router(doubts.router)
+app.include_router(topics.router)
+app.include_router(admin.router)
+app.include_router(feed.router)
+
+
+@app.on_event("startup")
+async def configure_thread_pool():
+    if admission_controller.enabled:
+        # Give every admitted request a worker thread, so one class saturating
+        # the pool can't starve the others.
+        limiter = to_thread.current_default_thread_limiter()
+        limiter.total_tokens = max(limiter.total_tokens, admission_controller.total_concurrency())
 
 
 @app.on_event("startup")
 def startup_event():
-    create_default_user()
+    if preloaded:
+        # Catch up on writes made since the master loaded the state.
+        state_sync.run_once()
+    else:
+        preload()
+    state_sync.start()
+    feed_fanout.start()
+    if settings.SEARCH_WARMER_ENABLED:
+        search_warmer.start()
+    if settings.RUN_BACKGROUND_JOBS:
+        feed_fanout.resume_pending()
+        search_history_compactor.start()
+        topic_stats.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    feed_fanout.stop()
+    state_sync.stop()
+    search_warmer.stop()
+    if not settings.RUN_BACKGROUND_JOBS:
+        return
+    search_history_compactor.stop()
+    topic_stats.stop()
+    try:
+        save_similar_doubts()
+    except Exception as e:
+        print(f"Error saving similar doubts index: {e}")
 
 
 @app.get("/health")
@@ -65,6 +219,19 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics():
+    return {
+        "admission": admission_controller.snapshot(),
+        "idempotency": idempotency_store.snapshot(),
+        "search_cache": {
+            **search_cache.snapshot(),
+            "warmer": search_warmer.snapshot(),
+            "providers": provider_health.snapshot(),
+        },
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, Boolean
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Table, Boolean, Index, UniqueConstraint, LargeBinary, false
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -63,6 +63,11 @@ class Topic(Base):
 
 class Group(Base):
     __tablename__ = "groups"
+    __table_args__ = (
+        Index("ix_groups_topic_member_count", "topic_id", "member_count"),
+        Index("ix_groups_topic_resource_count", "topic_id", "resource_count"),
+        Index("ix_groups_topic_last_activity_at", "topic_id", "last_activity_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(100), nullable=False)
@@ -70,6 +75,10 @@ class Group(Base):
     topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Denormalized counters maintained by the group write paths; see group_counters.py
+    member_count = Column(Integer, nullable=False, default=0, server_default="0")
+    resource_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_activity_at = Column(DateTime, default=datetime.utcnow, nullable=True)
 
     topic = relationship("Topic", back_populates="groups")
     members = relationship(
@@ -109,6 +118,9 @@ class Doubt(Base):
 
 class SearchHistory(Base):
     __tablename__ = "search_history"
+    __table_args__ = (
+        Index("ix_search_history_user_searched_at", "user_id", "searched_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -116,3 +128,87 @@ class SearchHistory(Base):
     searched_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="search_history")
+
+
+class SearchHistoryRollup(Base):
+    """Per-user, per-topic, per-day search counts compacted from search_history"""
+
+    __tablename__ = "search_history_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "topic", "day", name="uq_search_rollup_user_topic_day"),
+        Index("ix_search_rollup_user_last_searched_at", "user_id", "last_searched_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    topic = Column(String(100), nullable=False)
+    day = Column(Date, nullable=False)
+    search_count = Column(Integer, nullable=False, default=0)
+    last_searched_at = Column(DateTime, nullable=False)
+
+
+class GroupActivity(Base):
+    """A feed event in a group: a member joining or a resource being shared"""
+
+    __tablename__ = "group_activities"
+    __table_args__ = (
+        Index("ix_group_activities_group_created_at", "group_id", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
+    kind = Column(String(20), nullable=False)  # 'member' or 'resource'
+    actor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    resource_id = Column(Integer, ForeignKey("group_resources.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    fanned_out = Column(Boolean, default=False, nullable=False)
+    # Set at fan-out time: True when the group was too large to copy into
+    # timelines, so get_feed reads it from the group instead.
+    fanout_on_read = Column(Boolean, default=False, nullable=False, server_default=false())
+
+    group = relationship("Group")
+    resource = relationship("GroupResource")
+
+
+class TimelineEntry(Base):
+    """Fan-out-on-write copy of a GroupActivity in one member's feed"""
+
+    __tablename__ = "timeline_entries"
+    __table_args__ = (
+        UniqueConstraint("user_id", "activity_id", name="uq_timeline_user_activity"),
+        Index("ix_timeline_user_created_at", "user_id", "created_at", "activity_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    activity_id = Column(Integer, ForeignKey("group_activities.id"), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    activity = relationship("GroupActivity")
+
+
+class TopicStat(Base):
+    """Denormalized per-topic counters, keyed by normalized topic name"""
+
+    __tablename__ = "topic_stats"
+
+    topic = Column(String(100), primary_key=True)
+    groups = Column(Integer, nullable=False, default=0, server_default="0")
+    doubts = Column(Integer, nullable=False, default=0, server_default="0")
+    members = Column(Integer, nullable=False, default=0, server_default="0")
+    searches = Column(Integer, nullable=False, default=0, server_default="0")
+    reconciled_at = Column(DateTime, nullable=True)
+
+
+class IdempotencyKey(Base):
+    """An Idempotency-Key seen by any worker, and the response it produced"""
+
+    __tablename__ = "idempotency_keys"
+
+    # sha256 of (token subject, path, Idempotency-Key)
+    key_hash = Column(String(64), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL while the first attempt runs
+    headers = Column(Text, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
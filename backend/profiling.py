@@ -0,0 +1,302 @@
+"""On-demand per-request profiling.
+
+A request is profiled when an admin sends `X-Profile: 1` or when it is picked
+by PROFILE_SAMPLE_RATE. While it runs, a sampler thread records the stacks of
+the worker threads executing it, and the SQL it issues is timed through
+listeners on a private engine proxy. Each profile is written to PROFILE_DIR as
+`<id>.json` (summary and queries) and `<id>.folded` (collapsed stacks for
+flamegraph.pl or speedscope). Requests that aren't profiled get no sampler, no
+SQL listeners and no thread hooks; only the trigger check runs.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+from anyio import to_thread
+from sqlalchemy import event
+from auth import decode_token
+from config import get_settings
+
+settings = get_settings()
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_PATTERN = "^[0-9a-f]{32}$"
+TOP_FUNCTIONS = 25
+
+current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    for root in sorted({os.path.abspath(path) for path in sys.path if path}, key=len, reverse=True):
+        if filename.startswith(root + os.sep):
+            return filename[len(root) + 1 :]
+    return filename
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, trigger: str, interval: float):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.interval = interval
+        self.started_at = datetime.utcnow()
+        self.threads = set()
+        self.stacks = Counter()
+        self.queries = []
+        self.status_code = None
+        self.duration_ms = None
+        self.stop_event = threading.Event()
+        self.sampler = None
+
+    # Threads
+
+    def run_bound(self, func, *args):
+        """Run func in the current worker thread with that thread being sampled"""
+        ident = threading.get_ident()
+        self.threads.add(ident)
+        try:
+            return func(*args)
+        finally:
+            self.threads.discard(ident)
+
+    def start(self):
+        self.sampler = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+        self.sampler.start()
+
+    def _sample(self):
+        stop_code = RequestProfile.run_bound.__code__
+        while not self.stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self.threads):
+                frame = frames.get(ident)
+                labels = []
+                while frame is not None and frame.f_code is not stop_code:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if labels:
+                    self.stacks[";".join(reversed(labels))] += 1
+
+    # SQL
+
+    def bind(self, engine):
+        """An engine proxy sharing engine's pool whose queries are recorded here"""
+        bound = engine.execution_options()
+        event.listen(bound, "before_cursor_execute", self._before_query)
+        event.listen(bound, "after_cursor_execute", self._after_query)
+        return bound
+
+    def _before_query(self, conn, cursor, statement, parameters, context, executemany):
+        context.profile_query_start = time.perf_counter()
+
+    def _after_query(self, conn, cursor, statement, parameters, context, executemany):
+        self.queries.append(
+            {
+                "statement": statement,
+                "duration_ms": round((time.perf_counter() - context.profile_query_start) * 1000, 3),
+                "executemany": executemany,
+            }
+        )
+
+    # Results
+
+    def summary(self) -> dict:
+        self_samples = Counter()
+        total_samples = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_samples[frames[-1]] += count
+            for frame in set(frames):
+                total_samples[frame] += count
+
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "status_code": self.status_code,
+            "sample_interval_ms": self.interval * 1000,
+            "samples": sum(self.stacks.values()),
+            "query_count": len(self.queries),
+            "query_time_ms": round(sum(query["duration_ms"] for query in self.queries), 3),
+            "top_functions": [
+                {"function": frame, "self_samples": count, "total_samples": total_samples[frame]}
+                for frame, count in self_samples.most_common(TOP_FUNCTIONS)
+            ],
+            "queries": self.queries,
+        }
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class ProfileStore:
+    """Profiles on disk, so any worker can serve one recorded by another"""
+
+    def __init__(self, directory: str, max_profiles: int):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def path(self, profile_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.{suffix}")
+
+    def save(self, profile: RequestProfile):
+        profile.stop_event.set()
+        if profile.sampler:
+            profile.sampler.join()
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(profile.id, "folded"), "w") as f:
+            f.write(profile.collapsed())
+        with open(self.path(profile.id, "json"), "w") as f:
+            json.dump(profile.summary(), f)
+        self.prune()
+
+    def prune(self):
+        summaries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in summaries[: max(0, len(summaries) - self.max_profiles)]:
+            profile_id = entry.name[: -len(".json")]
+            for suffix in ("json", "folded"):
+                try:
+                    os.remove(self.path(profile_id, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            profile = self.load(entry.name[: -len(".json")])
+            if profile:
+                profile.pop("queries")
+                profile.pop("top_functions")
+                profiles.append(profile)
+        return sorted(profiles, key=lambda profile: profile["started_at"], reverse=True)
+
+    def load(self, profile_id: str) -> Optional[dict]:
+        try:
+            with open(self.path(profile_id, "json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+
+class ThreadHook:
+    """Swaps anyio's run_sync for a wrapper only while profiles are running.
+
+    FastAPI runs sync endpoints and dependencies through anyio.to_thread.run_sync
+    with the request's context copied in, so the wrapper can see which profile
+    (if any) a call belongs to and bind the worker thread to it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.original = None
+
+    async def run_sync(self, func, *args, **kwargs):
+        profile = current_profile.get()
+        if profile is not None:
+            return await self.original(profile.run_bound, func, *args, **kwargs)
+        return await self.original(func, *args, **kwargs)
+
+    def acquire(self):
+        with self.lock:
+            if self.active == 0:
+                self.original = to_thread.run_sync
+                to_thread.run_sync = self.run_sync
+            self.active += 1
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+            if self.active == 0:
+                to_thread.run_sync = self.original
+
+
+def _is_admin(headers: dict) -> bool:
+    scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    payload = decode_token(token)
+    return bool(payload) and payload.get("sub") in settings.ADMIN_EMAILS
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles requests asked for by an admin or picked by sampling"""
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float, interval: float):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.hook = ThreadHook()
+
+    def trigger(self, scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                if value not in (b"0", b"") and _is_admin(dict(scope["headers"])):
+                    return "header"
+                break
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trigger = self.trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], trigger, self.interval)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-profile-id", profile.id.encode())
+                ]
+            await send(message)
+
+        token = current_profile.set(profile)
+        self.hook.acquire()
+        profile.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            self.hook.release()
+            current_profile.reset(token)
+            try:
+                await to_thread.run_sync(self.store.save, profile)
+            except Exception as e:
+                print(f"Error saving profile {profile.id}: {e}")
+
+
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_STORED)
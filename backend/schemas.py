@@ -79,6 +79,9 @@ class GroupResponse(GroupBase):
     id: int
     created_by: int
     created_at: datetime
+    member_count: int = 0
+    resource_count: int = 0
+    last_activity_at: Optional[datetime] = None
     members: List[UserResponse] = []
     resources: List[GroupResourceResponse] = []
 
@@ -109,6 +112,14 @@ class DoubtDetailResponse(DoubtResponse):
     created_by_user: UserResponse
 
 
+class SimilarDoubtResponse(DoubtResponse):
+    score: float
+
+
+class DoubtCreateResponse(DoubtResponse):
+    possible_duplicates: Optional[List[SimilarDoubtResponse]] = None
+
+
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str
@@ -132,3 +143,55 @@ class DashboardResponse(BaseModel):
 class SearchResultsResponse(BaseModel):
     videos: List[dict]
     articles: List[dict]
+
+
+class TrendingTopicResponse(BaseModel):
+    topic: str
+    count: int
+
+
+class GroupCounterCheckResponse(BaseModel):
+    checked: int
+    mismatched: int
+    fixed: bool
+    group_ids: List[int]
+
+
+class FeedItemResponse(BaseModel):
+    id: int
+    kind: str
+    group_id: int
+    actor_id: int
+    created_at: datetime
+    resource: Optional[GroupResourceResponse] = None
+
+    class Config:
+        from_attributes = True
+
+
+class FeedResponse(BaseModel):
+    items: List[FeedItemResponse]
+    next_cursor: Optional[str] = None
+
+
+class TopicStatsResponse(BaseModel):
+    topic_id: int
+    name: str
+    groups: int
+    doubts: int
+    members: int
+    searches: int
+    reconciled_at: Optional[datetime] = None
+
+
+class ProfileSummaryResponse(BaseModel):
+    id: str
+    method: str
+    path: str
+    trigger: str
+    started_at: datetime
+    duration_ms: Optional[float] = None
+    status_code: Optional[int] = None
+    samples: int
+    query_count: int
+    query_time_ms: float
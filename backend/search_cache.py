@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from config import get_settings
+from search_providers import fetch_search_results, provider_health
+from trending import normalize_topic, trending_topics
+
+settings = get_settings()
+
+# Each warm refresh queries both providers.
+CALLS_PER_REFRESH = 2
+
+
+class SearchCache:
+    """LRU cache of provider results per normalized topic, with a fixed TTL.
+
+    Entries remember whether the warmer filled them, so the hit counters can
+    tell apart searches that were served warm by a refresh-ahead.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # topic -> (results, expires_at, warmed)
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.warmed_hits = 0
+        self.misses = 0
+
+    def get(self, topic: str):
+        key = normalize_topic(topic)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            if entry[2]:
+                self.warmed_hits += 1
+            return entry[0]
+
+    def put(self, topic: str, results: dict, warmed: bool = False):
+        key = normalize_topic(topic)
+        with self.lock:
+            self.entries[key] = (results, time.monotonic() + self.ttl_seconds, warmed)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def needs_refresh(self, topic: str, within_seconds: float) -> bool:
+        """True if the topic is missing or expires within the next `within_seconds`"""
+        with self.lock:
+            entry = self.entries.get(normalize_topic(topic))
+        return entry is None or entry[1] - time.monotonic() <= within_seconds
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            searches = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "searches": searches,
+                "hits": self.hits,
+                "warmed_hits": self.warmed_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / searches, 4) if searches else 0.0,
+                "warm_ratio": round(self.warmed_hits / searches, 4) if searches else 0.0,
+            }
+
+
+class CallBudget:
+    """Sliding one-minute window of upstream calls"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.calls = deque()
+
+    def used(self) -> int:
+        cutoff = time.monotonic() - 60
+        while self.calls and self.calls[0] <= cutoff:
+            self.calls.popleft()
+        return len(self.calls)
+
+    def spend(self, calls: int) -> bool:
+        if self.used() + calls > self.per_minute:
+            return False
+        now = time.monotonic()
+        self.calls.extend([now] * calls)
+        return True
+
+
+class SearchWarmer:
+    """Re-fetches popular topics shortly before their cached results expire"""
+
+    def __init__(
+        self,
+        cache: SearchCache,
+        top_n: int,
+        refresh_ahead_seconds: int,
+        interval_seconds: int,
+        popularity_seconds: int,
+        calls_per_minute: int,
+    ):
+        self.cache = cache
+        self.top_n = top_n
+        self.refresh_ahead_seconds = refresh_ahead_seconds
+        self.interval_seconds = interval_seconds
+        self.popularity_seconds = popularity_seconds
+        self.budget = CallBudget(calls_per_minute)
+        self.popular = []
+        self.popular_loaded_at = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.paused = False
+        self.refreshed = 0
+        self.failed = 0
+        self.skipped_budget = 0
+
+    def load_popular(self):
+        """Take the day's top topics from the in-memory trending counter"""
+        self.popular = [
+            normalize_topic(item["topic"])
+            for item in trending_topics.top(window="day", limit=self.top_n)
+        ]
+        self.popular_loaded_at = time.monotonic()
+
+    def run_once(self):
+        if (
+            self.popular_loaded_at is None
+            or time.monotonic() - self.popular_loaded_at >= self.popularity_seconds
+        ):
+            self.load_popular()
+
+        for topic in self.popular:
+            if self.stop_event.is_set():
+                return
+            self.paused = not provider_health.healthy()
+            if self.paused:
+                return
+            if not self.cache.needs_refresh(topic, self.refresh_ahead_seconds):
+                continue
+            if not self.budget.spend(CALLS_PER_REFRESH):
+                self.skipped_budget += 1
+                return
+
+            results, complete = fetch_search_results(topic)
+            if complete:
+                self.cache.put(topic, results, warmed=True)
+                self.refreshed += 1
+            else:
+                self.failed += 1
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Search warmer error: {e}")
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name="search-warmer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def snapshot(self) -> dict:
+        return {
+            "tracked_topics": len(self.popular),
+            "paused": self.paused,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "skipped_budget": self.skipped_budget,
+            "calls_last_minute": self.budget.used(),
+            "calls_per_minute": self.budget.per_minute,
+        }
+
+
+search_cache = SearchCache(
+    ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS,
+    max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+)
+search_warmer = SearchWarmer(
+    search_cache,
+    top_n=settings.SEARCH_WARMER_TOP_N,
+    refresh_ahead_seconds=settings.SEARCH_WARMER_REFRESH_AHEAD_SECONDS,
+    interval_seconds=settings.SEARCH_WARMER_INTERVAL_SECONDS,
+    popularity_seconds=settings.SEARCH_WARMER_POPULARITY_SECONDS,
+    calls_per_minute=settings.SEARCH_WARMER_CALLS_PER_MINUTE,
+)
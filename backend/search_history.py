@@ -0,0 +1,177 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+from config import get_settings
+from database import SessionLocal, engine
+from models import SearchHistory, SearchHistoryRollup
+
+settings = get_settings()
+
+# The trending counter replays the last day of raw rows on startup, so never
+# compact anything newer than that.
+MIN_RETENTION = timedelta(days=1)
+
+
+def ensure_search_history_indexes():
+    """Add the search_history indexes to a pre-existing table.
+
+    create_all skips tables that already exist, indexes included, so older
+    databases need them created in place.
+    """
+    for index in SearchHistory.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+def get_recent_searches(db: Session, user_id: int, limit: int = 10) -> list:
+    """Latest searches for a user, falling back to rollups once raw rows are compacted"""
+    raw = (
+        db.query(SearchHistory.topic, SearchHistory.searched_at)
+        .filter(SearchHistory.user_id == user_id)
+        .order_by(desc(SearchHistory.searched_at))
+        .limit(limit)
+        .all()
+    )
+    searches = [{"topic": topic, "searched_at": searched_at} for topic, searched_at in raw]
+
+    if len(searches) < limit:
+        rolled_up = (
+            db.query(SearchHistoryRollup.topic, SearchHistoryRollup.last_searched_at)
+            .filter(SearchHistoryRollup.user_id == user_id)
+            .order_by(desc(SearchHistoryRollup.last_searched_at))
+            .limit(limit - len(searches))
+            .all()
+        )
+        searches.extend(
+            {"topic": topic, "searched_at": searched_at} for topic, searched_at in rolled_up
+        )
+
+    return searches
+
+
+def compact_search_history(
+    db: Session,
+    now: Optional[datetime] = None,
+    retention_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """Roll raw search_history rows older than the retention window into daily rollups.
+
+    Each batch is aggregated, merged into the rollup table and deleted in its
+    own short transaction so writers are never blocked for long. Returns the
+    number of raw rows compacted.
+    """
+    if retention_days is None:
+        retention_days = settings.SEARCH_HISTORY_RETENTION_DAYS
+    if batch_size is None:
+        batch_size = settings.SEARCH_COMPACTION_BATCH_SIZE
+
+    retention = max(timedelta(days=retention_days), MIN_RETENTION)
+    cutoff = (now or datetime.utcnow()) - retention
+    compacted = 0
+
+    while True:
+        rows = (
+            db.query(
+                SearchHistory.id,
+                SearchHistory.user_id,
+                SearchHistory.topic,
+                SearchHistory.searched_at,
+            )
+            .filter(SearchHistory.searched_at < cutoff)
+            .order_by(SearchHistory.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        totals = {}
+        for _, user_id, topic, searched_at in rows:
+            key = (user_id, topic, searched_at.date())
+            count, last = totals.get(key, (0, searched_at))
+            totals[key] = (count + 1, max(last, searched_at))
+
+        try:
+            for (user_id, topic, day), (count, last) in totals.items():
+                rollup = (
+                    db.query(SearchHistoryRollup)
+                    .filter(
+                        SearchHistoryRollup.user_id == user_id,
+                        SearchHistoryRollup.topic == topic,
+                        SearchHistoryRollup.day == day,
+                    )
+                    .first()
+                )
+                if rollup:
+                    rollup.search_count += count
+                    rollup.last_searched_at = max(rollup.last_searched_at, last)
+                else:
+                    db.add(
+                        SearchHistoryRollup(
+                            user_id=user_id,
+                            topic=topic,
+                            day=day,
+                            search_count=count,
+                            last_searched_at=last,
+                        )
+                    )
+
+            db.query(SearchHistory).filter(
+                SearchHistory.id.in_([row[0] for row in rows])
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        compacted += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    return compacted
+
+
+class SearchHistoryCompactor:
+    """Runs compact_search_history periodically on a daemon thread"""
+
+    def __init__(self, interval_seconds: int):
+        self.interval_seconds = interval_seconds
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def run_once(self) -> int:
+        db = SessionLocal()
+        try:
+            return compact_search_history(db)
+        finally:
+            db.close()
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval_seconds):
+            try:
+                compacted = self.run_once()
+                if compacted:
+                    print(f"✓ Compacted {compacted} search history rows")
+            except Exception as e:
+                print(f"Search history compaction error: {e}")
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._loop, name="search-history-compactor", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+
+search_history_compactor = SearchHistoryCompactor(
+    interval_seconds=settings.SEARCH_COMPACTION_INTERVAL_SECONDS
+)
@@ -0,0 +1,156 @@
+import threading
+import time
+import requests
+from config import get_settings
+
+settings = get_settings()
+
+
+class ProviderHealth:
+    """Marks a search provider unhealthy after repeated failures, for a cooldown period"""
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: int):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.lock = threading.Lock()
+        self.failures = {}
+        self.unhealthy_until = {}
+
+    def record(self, provider: str, ok: bool):
+        with self.lock:
+            if ok:
+                self.failures[provider] = 0
+                self.unhealthy_until.pop(provider, None)
+                return
+            self.failures[provider] = self.failures.get(provider, 0) + 1
+            if self.failures[provider] >= self.failure_threshold:
+                self.unhealthy_until[provider] = time.monotonic() + self.cooldown_seconds
+
+    def healthy(self) -> bool:
+        now = time.monotonic()
+        with self.lock:
+            return all(until <= now for until in self.unhealthy_until.values())
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self.lock:
+            return {
+                provider: {
+                    "consecutive_failures": failures,
+                    "healthy": self.unhealthy_until.get(provider, 0) <= now,
+                }
+                for provider, failures in self.failures.items()
+            }
+
+
+def fetch_search_results(topic: str):
+    """Query every provider for a topic.
+
+    Returns (results, complete); complete is False when a provider failed and
+    its results were replaced by an empty list, so they shouldn't be cached.
+    """
+    results = {}
+    complete = True
+    for key, provider, search in (
+        ("videos", "YouTube", search_youtube),
+        ("articles", "Bing", search_articles),
+    ):
+        try:
+            results[key] = search(topic)
+            provider_health.record(provider, True)
+        except Exception as e:
+            print(f"{provider} search error: {e}")
+            provider_health.record(provider, False)
+            results[key] = []
+            complete = False
+    return results, complete
+
+
+def search_youtube(query: str) -> list:
+    if not settings.YOUTUBE_API_KEY:
+        return [
+            {
+                "id": f"placeholder_{i}",
+                "title": f"Sample {query} Video {i+1}",
+                "description": f"This is a sample video about {query}. Please configure your YouTube API key to fetch real videos.",
+                "thumbnail": "https://via.placeholder.com/320x180?text=YouTube",
+                "url": f"https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+            }
+            for i in range(3)
+        ]
+
+    url = "https://www.googleapis.com/youtube/v3/search"
+    params = {
+        "part": "snippet",
+        "q": query,
+        "type": "video",
+        "maxResults": 10,
+        "key": settings.YOUTUBE_API_KEY,
+    }
+
+    response = requests.get(url, params=params, timeout=5)
+    response.raise_for_status()
+    data = response.json()
+
+    videos = []
+    for item in data.get("items", []):
+        video_id = item.get("id", {}).get("videoId")
+        snippet = item.get("snippet", {})
+
+        if video_id:
+            videos.append(
+                {
+                    "id": video_id,
+                    "title": snippet.get("title", ""),
+                    "description": snippet.get("description", ""),
+                    "thumbnail": snippet.get("thumbnails", {})
+                    .get("medium", {})
+                    .get("url", ""),
+                    "url": f"https://www.youtube.com/watch?v={video_id}",
+                }
+            )
+
+    return videos
+
+
+def search_articles(query: str) -> list:
+    if not settings.BING_SEARCH_API_KEY:
+        return [
+            {
+                "title": f"Sample {query} Article {i+1}",
+                "description": f"This is a sample article about {query}. Please configure your Bing Search API key to fetch real articles.",
+                "url": f"https://example.com/article-{i+1}",
+                "source": "Example Source",
+            }
+            for i in range(3)
+        ]
+
+    url = "https://api.bing.microsoft.com/v7.0/search"
+    headers = {"Ocp-Apim-Subscription-Key": settings.BING_SEARCH_API_KEY}
+    params = {
+        "q": query,
+        "count": 10,
+    }
+
+    response = requests.get(url, headers=headers, params=params, timeout=5)
+    response.raise_for_status()
+    data = response.json()
+
+    articles = []
+    for item in data.get("webPages", {}).get("value", []):
+        articles.append(
+            {
+                "title": item.get("name", ""),
+                "description": item.get("snippet", ""),
+                "url": item.get("url", ""),
+                "source": item.get("displayUrl", ""),
+            }
+        )
+
+    return articles
+
+
+provider_health = ProviderHealth(
+    failure_threshold=settings.SEARCH_PROVIDER_FAILURE_THRESHOLD,
+    cooldown_seconds=settings.SEARCH_PROVIDER_COOLDOWN_SECONDS,
+)
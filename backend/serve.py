@@ -0,0 +1,317 @@
+"""Pre-forking production launcher.
+
+Usage:
+    python serve.py --workers 4 --port 8000
+
+The app is imported once in the master process, which also loads the in-memory
+state (trending counter, similar-doubt index), and the workers are forked from
+it, so imports and that data are shared copy-on-write. Signals to the master:
+    HUP        rolling restart: the master re-execs itself (picking up new code)
+               and replaces workers one at a time without closing the socket
+    TERM/INT   graceful shutdown
+
+Workers exit after --max-requests (plus jitter) and are replaced automatically.
+The DB_CONNECTION_BUDGET is split evenly between workers as their pool size, and
+SEARCH_WARMER_CALLS_PER_MINUTE is split the same way.
+"""
+import argparse
+import gc
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from config import Settings
+
+LISTEN_FD_ENV = "LEARNCONNECT_LISTEN_FD"
+OLD_WORKERS_ENV = "LEARNCONNECT_OLD_WORKERS"
+WARMER_BUDGET_ENV = "LEARNCONNECT_WARMER_CALLS_PER_MINUTE"
+READY_TIMEOUT_SECONDS = 60
+# admission.BACKGROUND_CONNECTIONS plus one admitted request per route class.
+# (admission can't be imported here: it reads the settings this module sets.)
+MIN_WORKER_POOL = 9
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run LearnConnect with pre-forked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("WEB_CONCURRENCY", 0)) or os.cpu_count() or 1,
+        help="Worker processes (default: WEB_CONCURRENCY or the CPU count)",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=10000,
+        help="Recycle a worker after this many requests (0 disables)",
+    )
+    parser.add_argument("--max-requests-jitter", type=int, default=1000)
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    parser.add_argument(
+        "--db-connection-budget",
+        type=int,
+        default=None,
+        help="Total DB connections across workers (default: DB_CONNECTION_BUDGET)",
+    )
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args(argv)
+
+
+def fit_workers(workers: int, budget: int) -> int:
+    """Cap the worker count so every worker gets MIN_WORKER_POOL connections within budget"""
+    if budget < MIN_WORKER_POOL:
+        sys.exit(
+            f"DB_CONNECTION_BUDGET={budget} is below the {MIN_WORKER_POOL} connections a worker needs"
+        )
+    fitted = min(workers, budget // MIN_WORKER_POOL)
+    if fitted < workers:
+        print(
+            f"Running {fitted} workers instead of {workers}: DB_CONNECTION_BUDGET={budget} "
+            f"allows {MIN_WORKER_POOL} connections for at most {fitted}",
+            file=sys.stderr,
+        )
+    return fitted
+
+
+def configure_pool(workers: int, budget: int):
+    """Split the connection budget across workers before the engine is created"""
+    per_worker = budget // workers
+    os.environ["DB_POOL_SIZE"] = str(per_worker)
+    os.environ["DB_MAX_OVERFLOW"] = "0"
+    return per_worker
+
+
+def configure_search_warmer(workers: int):
+    """Each worker caches and warms separately, so split the upstream call budget"""
+    # Remember the configured total, since a re-exec would otherwise split the split.
+    total = int(
+        os.environ.setdefault(WARMER_BUDGET_ENV, str(Settings().SEARCH_WARMER_CALLS_PER_MINUTE))
+    )
+    os.environ["SEARCH_WARMER_CALLS_PER_MINUTE"] = str(max(1, total // workers))
+
+
+def listen_socket(args) -> socket.socket:
+    inherited = os.environ.pop(LISTEN_FD_ENV, None)
+    if inherited:
+        sock = socket.socket(fileno=int(inherited))
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((args.host, args.port))
+        sock.listen(args.backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(args, app, sock: socket.socket, slot: int, ready_fd: int):
+    import uvicorn
+    from config import get_settings
+    from database import engine
+
+    for sig in (signal.SIGHUP, signal.SIGCHLD, signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, signal.SIG_DFL)
+    random.seed()
+
+    # Pooled connections opened in the master must not be shared after fork.
+    engine.dispose(close=False)
+    get_settings().RUN_BACKGROUND_JOBS = slot == 0
+
+    limit = None
+    if args.max_requests:
+        limit = args.max_requests + random.randint(0, max(0, args.max_requests_jitter))
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app,
+            limit_max_requests=limit,
+            timeout_graceful_shutdown=args.graceful_timeout,
+            log_level=args.log_level,
+        )
+    )
+
+    def notify_ready():
+        while not server.started and not server.should_exit:
+            time.sleep(0.05)
+        try:
+            os.write(ready_fd, b"1")
+        except OSError:
+            pass  # the master stopped listening for this worker
+        finally:
+            os.close(ready_fd)
+
+    threading.Thread(target=notify_ready, daemon=True).start()
+    server.run(sockets=[sock])
+
+
+class Master:
+    def __init__(self, args, app, sock: socket.socket):
+        self.args = args
+        self.app = app
+        self.sock = sock
+        self.workers = {}  # pid -> slot
+        self.stopping = False
+        self.reexec = False
+
+    def spawn(self, slot: int):
+        """Fork a worker for `slot`; returns (pid, fd that becomes readable once it serves)"""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                run_worker(self.args, self.app, self.sock, slot, write_fd)
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        self.workers[pid] = slot
+        return pid, read_fd
+
+    def wait_ready(self, ready_fd: int, timeout: float = READY_TIMEOUT_SECONDS) -> bool:
+        try:
+            ready, _, _ = select.select([ready_fd], [], [], timeout)
+            return bool(ready) and os.read(ready_fd, 1) == b"1"
+        finally:
+            os.close(ready_fd)
+
+    def wait_exit(self, pid: int, timeout: float):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if done:
+                return
+            time.sleep(0.1)
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+    def retire(self, pid: int):
+        self.workers.pop(pid, None)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        self.wait_exit(pid, self.args.graceful_timeout)
+
+    def start(self):
+        pending = [self.spawn(slot) for slot in range(self.args.workers)]
+        for pid, ready_fd in pending:
+            if not self.wait_ready(ready_fd):
+                print(f"Worker {pid} did not become ready", file=sys.stderr)
+
+    def rolling_replace(self, old_workers: list):
+        """Replace workers inherited from before a re-exec, one slot at a time"""
+        for pid, slot in old_workers:
+            if slot < self.args.workers:
+                _, ready_fd = self.spawn(slot)
+                if not self.wait_ready(ready_fd):
+                    print(f"Replacement for slot {slot} did not become ready", file=sys.stderr)
+            self.retire(pid)
+        filled = set(self.workers.values())
+        for slot in range(self.args.workers):
+            if slot not in filled:
+                os.close(self.spawn(slot)[1])
+
+    def reap(self):
+        """Collect exited workers and respawn their slots (this is how recycling happens)"""
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self.workers.pop(pid, None)
+            if slot is not None and not self.stopping and not self.reexec:
+                os.close(self.spawn(slot)[1])
+
+    def exec_self(self):
+        os.environ[LISTEN_FD_ENV] = str(self.sock.fileno())
+        os.environ[OLD_WORKERS_ENV] = ",".join(
+            f"{pid}:{slot}" for pid, slot in self.workers.items()
+        )
+        print("↻ Re-executing master for a rolling restart", file=sys.stderr)
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    def shutdown(self):
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.workers):
+            self.wait_exit(pid, self.args.graceful_timeout)
+        self.workers.clear()
+
+    def handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def handle_reexec(self, signum, frame):
+        self.reexec = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reexec)
+
+        old_workers = os.environ.pop(OLD_WORKERS_ENV, "")
+        if old_workers:
+            self.rolling_replace(
+                [tuple(int(part) for part in item.split(":")) for item in old_workers.split(",")]
+            )
+        else:
+            self.start()
+
+        while not self.stopping and not self.reexec:
+            self.reap()
+            time.sleep(0.5)
+
+        if self.reexec and not self.stopping:
+            self.exec_self()
+        self.shutdown()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    budget = args.db_connection_budget or Settings().DB_CONNECTION_BUDGET
+    args.workers = fit_workers(args.workers, budget)
+    per_worker = configure_pool(args.workers, budget)
+    configure_search_warmer(args.workers)
+
+    if not hasattr(os, "fork"):
+        import uvicorn
+        from main import app
+
+        print("Forking is not supported on this platform; running a single worker")
+        uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+        return
+
+    sock = listen_socket(args)
+
+    # Preload: import the app (and run schema setup) once, before forking.
+    import main as application
+
+    application.preload()
+    # Move everything imported so far out of the GC's reach, so collections in
+    # the workers don't touch (and un-share) the preloaded pages.
+    gc.freeze()
+
+    print(
+        f"✓ Serving on {args.host}:{args.port} with {args.workers} workers "
+        f"({per_worker} DB connections each)"
+    )
+    Master(args, application.app, sock).run()
+
+
+if __name__ == "__main__":
+    main()
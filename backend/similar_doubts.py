@@ -0,0 +1,396 @@
+import os
+import re
+import time
+import zlib
+from collections import deque
+from threading import Lock
+import numpy as np
+from sqlalchemy import func
+from config import get_settings
+
+settings = get_settings()
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+HASH_SEED = 0x5EED
+# Recent inserts are kept in an unsorted tail and scanned directly; once the
+# tail grows past this many rows it is merged into the sorted band arrays.
+DELTA_LIMIT = 4096
+# Upper bound on rows pulled from any one band bucket, so a very common
+# phrasing can't turn a lookup into a full scan.
+MAX_BUCKET_CANDIDATES = 2000
+# Rewrite the index without tombstones once this share of rows is deleted.
+MAX_DEAD_FRACTION = 0.25
+# Each sync re-reads ids above the highest id seen this long ago, to catch
+# doubts whose transactions committed after a later id was already synced.
+SYNC_LAG_SECONDS = 120
+
+
+def doubt_text(title: str, description: str) -> str:
+    return f"{title} {description}"
+
+
+def shingles(text: str) -> np.ndarray:
+    """Stable 32-bit hashes of word unigrams and bigrams"""
+    tokens = TOKEN_RE.findall(text.lower())
+    grams = set(tokens)
+    grams.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    return np.fromiter(
+        (zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint64, count=len(grams)
+    )
+
+
+class MinHashIndex:
+    """MinHash LSH index over doubt title + description.
+
+    Signatures live in a growable NumPy matrix, next to each row's shingle
+    count so a query can be scored by containment as well as Jaccard. Each LSH band keeps its keys
+    in a sorted array searched with np.searchsorted, plus an unsorted tail of
+    recent inserts, so lookups stay sub-millisecond without a Python dict per
+    bucket. Deletes are tombstones, compacted away on save once they pile up.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 32):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+
+        rng = np.random.default_rng(HASH_SEED)
+        self.a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self.band_mult = rng.integers(1, 2**63, size=self.rows_per_band, dtype=np.uint64)
+
+        self.lock = Lock()
+        self._reset(capacity=1024)
+        # Doubts without any indexable words, so syncs don't keep retrying them
+        self.unindexable = set()
+        self.synced_id = None
+        self.sync_marks = deque()  # (monotonic time, highest doubt id seen)
+
+    def _reset(self, capacity: int):
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.sigs = np.zeros((capacity, self.num_perm), dtype=np.uint32)
+        self.sizes = np.zeros(capacity, dtype=np.int32)
+        self.merged = 0
+        self.sorted_keys = np.zeros((self.bands, 0), dtype=np.uint32)
+        self.sorted_rows = np.zeros((self.bands, 0), dtype=np.int32)
+        self.max_id = 0
+
+    def signature(self, text: str):
+        """(MinHash signature, shingle count), or (None, 0) for text without words"""
+        hashes = shingles(text)
+        if not len(hashes):
+            return None, 0
+        permuted = self.a[:, None] * hashes[None, :] + self.b[:, None]
+        return (permuted.min(axis=1) >> np.uint64(32)).astype(np.uint32), len(hashes)
+
+    def _band_keys(self, sigs: np.ndarray) -> np.ndarray:
+        """(n, num_perm) signatures -> (bands, n) uint32 bucket keys"""
+        banded = sigs.reshape(len(sigs), self.bands, self.rows_per_band).astype(np.uint64)
+        keys = (banded * self.band_mult).sum(axis=2) >> np.uint64(32)
+        return keys.astype(np.uint32).T
+
+    def _grow(self):
+        capacity = len(self.ids) * 2
+        self.ids = np.resize(self.ids, capacity)
+        self.alive = np.resize(self.alive, capacity)
+        self.alive[self.size:] = False
+        sigs = np.zeros((capacity, self.num_perm), dtype=np.uint32)
+        sigs[: self.size] = self.sigs[: self.size]
+        self.sigs = sigs
+        self.sizes = np.resize(self.sizes, capacity)
+
+    def _merge_delta(self):
+        if self.merged == self.size:
+            return
+        delta_rows = np.arange(self.merged, self.size, dtype=np.int32)
+        delta_keys = self._band_keys(self.sigs[self.merged : self.size])
+
+        width = self.sorted_keys.shape[1] + len(delta_rows)
+        keys = np.empty((self.bands, width), dtype=np.uint32)
+        rows = np.empty((self.bands, width), dtype=np.int32)
+        for band in range(self.bands):
+            order = np.argsort(delta_keys[band], kind="stable")
+            band_keys = delta_keys[band][order]
+            positions = np.searchsorted(self.sorted_keys[band], band_keys)
+            keys[band] = np.insert(self.sorted_keys[band], positions, band_keys)
+            rows[band] = np.insert(self.sorted_rows[band], positions, delta_rows[order])
+        self.sorted_keys = keys
+        self.sorted_rows = rows
+        self.merged = self.size
+
+    def _row_of(self, doubt_id: int):
+        if doubt_id > self.max_id:
+            return None
+        ids = self.ids[: self.size]
+        row = int(np.searchsorted(ids, doubt_id))
+        if row < self.size and ids[row] == doubt_id:
+            return row
+        matches = np.flatnonzero(ids == doubt_id)
+        return int(matches[0]) if len(matches) else None
+
+    def add(self, doubt_id: int, text: str):
+        sig, size = self.signature(text)
+        if sig is None:
+            with self.lock:
+                self.unindexable.add(doubt_id)
+            return
+        with self.lock:
+            row = self._row_of(doubt_id)
+            if row is not None and self.alive[row]:
+                # Already picked up by a sync.
+                return
+            if self.size == len(self.ids):
+                self._grow()
+            self.ids[self.size] = doubt_id
+            self.alive[self.size] = True
+            self.sigs[self.size] = sig
+            self.sizes[self.size] = size
+            self.size += 1
+            self.max_id = max(self.max_id, doubt_id)
+            if self.size - self.merged >= DELTA_LIMIT:
+                self._merge_delta()
+
+    def remove(self, doubt_id: int):
+        with self.lock:
+            row = self._row_of(doubt_id)
+            if row is not None:
+                self.alive[row] = False
+            self.unindexable.discard(doubt_id)
+
+    def remove_many(self, doubt_ids: np.ndarray):
+        with self.lock:
+            self.alive[: self.size][np.isin(self.ids[: self.size], doubt_ids)] = False
+            self.unindexable.difference_update(doubt_ids.tolist())
+
+    def known_ids(self) -> np.ndarray:
+        """Ids of every doubt the index has seen and not removed, indexed or not"""
+        with self.lock:
+            live = self.ids[: self.size][self.alive[: self.size]]
+            return np.union1d(live, np.fromiter(self.unindexable, dtype=np.int64))
+
+    def known_count(self, up_to_id: int) -> int:
+        with self.lock:
+            ids = self.ids[: self.size]
+            live = int(np.count_nonzero(self.alive[: self.size] & (ids <= up_to_id)))
+            return live + sum(1 for doubt_id in self.unindexable if doubt_id <= up_to_id)
+
+    def contains(self, doubt_id: int) -> bool:
+        with self.lock:
+            if doubt_id in self.unindexable:
+                return True
+            row = self._row_of(doubt_id)
+            return row is not None and bool(self.alive[row])
+
+    def query(
+        self, text: str, limit: int = 5, threshold: float = 0.5, containment: bool = False
+    ) -> list:
+        """Return [(doubt_id, score)] best first.
+
+        The score is the estimated Jaccard similarity, or with `containment`
+        the estimated share of the query's shingles found in the doubt, which
+        suits short free-text queries against longer doubts.
+        """
+        sig, query_size = self.signature(text)
+        if sig is None:
+            return []
+
+        query_keys = self._band_keys(sig[None, :])[:, 0]
+        with self.lock:
+            candidates = []
+            for band in range(self.bands):
+                band_keys = self.sorted_keys[band]
+                lo = np.searchsorted(band_keys, query_keys[band], side="left")
+                hi = np.searchsorted(band_keys, query_keys[band], side="right")
+                if hi > lo:
+                    hi = min(hi, lo + MAX_BUCKET_CANDIDATES)
+                    candidates.append(self.sorted_rows[band][lo:hi])
+            if self.merged < self.size:
+                delta_keys = self._band_keys(self.sigs[self.merged : self.size])
+                hits = np.flatnonzero((delta_keys == query_keys[:, None]).any(axis=0))
+                candidates.append((hits + self.merged).astype(np.int32))
+            if not candidates:
+                return []
+
+            rows = np.unique(np.concatenate(candidates))
+            rows = rows[self.alive[rows]]
+            scores = (self.sigs[rows] == sig).mean(axis=1)
+            ids = self.ids[rows]
+            sizes = self.sizes[rows]
+
+        if containment:
+            # |Q ∩ D| = J * (|Q| + |D|) / (1 + J)
+            scores = np.minimum(1.0, scores * (query_size + sizes) / ((1 + scores) * query_size))
+
+        keep = scores >= threshold
+        scores, ids = scores[keep], ids[keep]
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+    def _compact(self):
+        """Drop tombstoned rows and re-sort every band from scratch"""
+        live = self.alive[: self.size]
+        ids, sigs = self.ids[: self.size][live], self.sigs[: self.size][live]
+        sizes = self.sizes[: self.size][live]
+        max_id = self.max_id
+        self._reset(capacity=max(1024, len(ids) * 2))
+        self.size = len(ids)
+        self.ids[: self.size] = ids
+        self.alive[: self.size] = True
+        self.sigs[: self.size] = sigs
+        self.sizes[: self.size] = sizes
+        self.max_id = max_id
+
+        keys = self._band_keys(sigs)
+        order = np.argsort(keys, axis=1, kind="stable").astype(np.int32)
+        self.sorted_keys = np.take_along_axis(keys, order, axis=1)
+        self.sorted_rows = order
+        self.merged = self.size
+
+    def save(self, path: str):
+        with self.lock:
+            dead = self.size - int(self.alive[: self.size].sum())
+            if dead > self.size * MAX_DEAD_FRACTION:
+                self._compact()
+            else:
+                self._merge_delta()
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(
+                tmp_path,
+                num_perm=self.num_perm,
+                bands=self.bands,
+                max_id=self.max_id,
+                ids=self.ids[: self.size],
+                alive=self.alive[: self.size],
+                sigs=self.sigs[: self.size],
+                sizes=self.sizes[: self.size],
+                unindexable=np.array(sorted(self.unindexable), dtype=np.int64),
+                sorted_keys=self.sorted_keys,
+                sorted_rows=self.sorted_rows,
+            )
+            os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            if (
+                int(data["num_perm"]) != self.num_perm
+                or int(data["bands"]) != self.bands
+                or "sizes" not in data.files
+            ):
+                return False
+            with self.lock:
+                size = len(data["ids"])
+                self._reset(capacity=max(1024, size * 2))
+                self.size = size
+                self.ids[:size] = data["ids"]
+                self.alive[:size] = data["alive"]
+                self.sigs[:size] = data["sigs"]
+                self.sizes[:size] = data["sizes"]
+                self.sorted_keys = data["sorted_keys"]
+                self.sorted_rows = data["sorted_rows"]
+                self.merged = size
+                self.max_id = int(data["max_id"])
+                if "unindexable" in data.files:
+                    self.unindexable = set(data["unindexable"].tolist())
+        return True
+
+    def clear(self):
+        with self.lock:
+            self._reset(capacity=1024)
+            self.unindexable = set()
+            self.synced_id = None
+            self.sync_marks.clear()
+
+
+similar_doubts = MinHashIndex(
+    num_perm=settings.SIMILAR_DOUBTS_NUM_PERM,
+    bands=settings.SIMILAR_DOUBTS_BANDS,
+)
+
+
+def _index_doubts(db, doubt_ids: list, chunk_size: int):
+    from models import Doubt
+
+    for start in range(0, len(doubt_ids), chunk_size):
+        rows = (
+            db.query(Doubt.id, Doubt.title, Doubt.description)
+            .filter(Doubt.id.in_(doubt_ids[start : start + chunk_size]))
+            .order_by(Doubt.id)
+        )
+        for doubt_id, title, description in rows:
+            similar_doubts.add(doubt_id, doubt_text(title, description))
+
+
+def reconcile_similar_doubts(db, chunk_size: int = 1000):
+    """Make the index match the doubts table by comparing every id.
+
+    Indexes every doubt the index is missing and drops every doubt that no
+    longer exists, whichever worker created or deleted it.
+    """
+    from models import Doubt
+
+    db_ids = np.fromiter((doubt_id for (doubt_id,) in db.query(Doubt.id)), dtype=np.int64)
+    known = similar_doubts.known_ids()
+
+    _index_doubts(db, np.setdiff1d(db_ids, known).tolist(), chunk_size)
+
+    stale = np.setdiff1d(known, db_ids).tolist()
+    for start in range(0, len(stale), chunk_size):
+        chunk = stale[start : start + chunk_size]
+        # Doubts created after the id scan are indexed but not in db_ids;
+        # re-check so only rows that are really gone are dropped.
+        existing = {doubt_id for (doubt_id,) in db.query(Doubt.id).filter(Doubt.id.in_(chunk))}
+        similar_doubts.remove_many(np.array([i for i in chunk if i not in existing], dtype=np.int64))
+
+    synced_id = int(db_ids.max()) if len(db_ids) else 0
+    similar_doubts.synced_id = synced_id
+    similar_doubts.sync_marks.clear()
+    similar_doubts.sync_marks.append((time.monotonic(), synced_id))
+
+
+def sync_similar_doubts(db, chunk_size: int = 1000):
+    """Pick up doubts created or deleted by other workers since the last sync.
+
+    New doubts are read by primary key above a watermark that trails by
+    SYNC_LAG_SECONDS, so late commits are caught. Below the watermark, the
+    doubt count is compared with the index; a difference (a delete, or a
+    commit later than the lag) triggers a full reconcile.
+    """
+    from models import Doubt
+
+    marks = similar_doubts.sync_marks
+    if similar_doubts.synced_id is None or not marks:
+        reconcile_similar_doubts(db, chunk_size)
+        return
+
+    now = time.monotonic()
+    while len(marks) > 1 and marks[1][0] <= now - SYNC_LAG_SECONDS:
+        marks.popleft()
+    low_id = marks[0][1]
+
+    new_ids = [doubt_id for (doubt_id,) in db.query(Doubt.id).filter(Doubt.id > low_id)]
+    _index_doubts(
+        db, [doubt_id for doubt_id in new_ids if not similar_doubts.contains(doubt_id)], chunk_size
+    )
+    similar_doubts.synced_id = max([similar_doubts.synced_id] + new_ids)
+    marks.append((now, similar_doubts.synced_id))
+
+    stored = db.query(func.count(Doubt.id)).filter(Doubt.id <= low_id).scalar()
+    if stored != similar_doubts.known_count(low_id):
+        reconcile_similar_doubts(db, chunk_size)
+
+
+def load_similar_doubts(db):
+    """Load the persisted index, then bring it in line with the doubts table"""
+    similar_doubts.clear()
+    similar_doubts.load(settings.SIMILAR_DOUBTS_INDEX_PATH)
+    reconcile_similar_doubts(db)
+
+
+def save_similar_doubts():
+    similar_doubts.save(settings.SIMILAR_DOUBTS_INDEX_PATH)
@@ -0,0 +1,63 @@
+import threading
+import time
+from config import get_settings
+from database import SessionLocal
+from similar_doubts import sync_similar_doubts
+from trending import sync_trending
+
+settings = get_settings()
+
+
+class StateSync:
+    """Keeps each worker's in-memory indexes in line with the database.
+
+    Under serve.py every worker holds its own trending counter and
+    similar-doubt index, and a request only reaches one of them, so each
+    worker polls the tables for writes made by the others.
+    """
+
+    def __init__(self, jobs: dict):
+        self.jobs = jobs  # name -> (func(db), interval_seconds)
+        self.last_run = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def run_once(self):
+        now = time.monotonic()
+        for name, (func, interval) in self.jobs.items():
+            if now - self.last_run.get(name, now - interval) < interval:
+                continue
+            self.last_run[name] = now
+            db = SessionLocal()
+            try:
+                func(db)
+            except Exception as e:
+                print(f"State sync error ({name}): {e}")
+            finally:
+                db.close()
+
+    def _loop(self):
+        tick = min(interval for _, interval in self.jobs.values())
+        while not self.stop_event.wait(tick):
+            self.run_once()
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.last_run = dict.fromkeys(self.jobs, time.monotonic())
+        self.thread = threading.Thread(target=self._loop, name="state-sync", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+
+state_sync = StateSync(
+    {
+        "trending": (sync_trending, settings.TRENDING_SYNC_SECONDS),
+        "similar_doubts": (sync_similar_doubts, settings.SIMILAR_DOUBTS_SYNC_SECONDS),
+    }
+)
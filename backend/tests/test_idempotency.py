@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.orm import sessionmaker
+import idempotency
+from idempotency import IdempotencyStore
+from models import IdempotencyKey
+
+KEY = ("user@example.com", "/api/doubts", b"retry-1")
+
+
+@pytest.fixture
+def store(db, monkeypatch):
+    monkeypatch.setattr(idempotency, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    return IdempotencyStore(ttl_seconds=60, max_keys=10, in_flight_seconds=60)
+
+
+def test_second_worker_sees_the_claim_and_then_the_response(store):
+    # Separate stores stand in for separate worker processes.
+    other = IdempotencyStore(ttl_seconds=60, max_keys=10, in_flight_seconds=60)
+
+    assert store.claim(KEY, "body") == ("claimed", None)
+    assert other.claim(KEY, "body") == ("busy", None)
+    assert other.claim(KEY, "other body") == ("mismatch", None)
+
+    response = (201, [(b"content-type", b"application/json")], b'{"id": 1}')
+    store.store_response(KEY, response)
+    assert other.claim(KEY, "body") == ("done", response)
+
+
+def test_released_and_expired_claims_can_be_claimed_again(store, db):
+    assert store.claim(KEY, "body") == ("claimed", None)
+    store.release(KEY)
+    assert store.claim(KEY, "body") == ("claimed", None)
+
+    db.query(IdempotencyKey).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    assert store.claim(KEY, "body") == ("claimed", None)
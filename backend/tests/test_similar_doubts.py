@@ -0,0 +1,66 @@
+import pytest
+import similar_doubts as module
+from models import Doubt
+from similar_doubts import reconcile_similar_doubts, similar_doubts, sync_similar_doubts
+
+
+@pytest.fixture(autouse=True)
+def reset_index():
+    similar_doubts.clear()
+    yield
+    similar_doubts.clear()
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    """Ids whose text each sync fetched from the database"""
+    calls = []
+    index_doubts = module._index_doubts
+
+    def record(db, doubt_ids, chunk_size):
+        calls.append(list(doubt_ids))
+        index_doubts(db, doubt_ids, chunk_size)
+
+    monkeypatch.setattr(module, "_index_doubts", record)
+    return calls
+
+
+def add_doubt(db, title, description="how does it work in python"):
+    doubt = Doubt(topic="python", title=title, description=description, created_by=db.user_id)
+    db.add(doubt)
+    db.commit()
+    return doubt.id
+
+
+def test_sync_picks_up_doubts_from_other_workers(db):
+    reconcile_similar_doubts(db)
+    doubt_id = add_doubt(db, "decorators with arguments")
+
+    sync_similar_doubts(db)
+
+    assert similar_doubts.contains(doubt_id)
+    assert similar_doubts.query("decorators with arguments how does it work in python")[0][0] == doubt_id
+
+
+def test_sync_drops_doubts_deleted_elsewhere(db, monkeypatch):
+    monkeypatch.setattr(module, "SYNC_LAG_SECONDS", 0)
+    doubt_id = add_doubt(db, "generators and yield")
+    reconcile_similar_doubts(db)
+    sync_similar_doubts(db)
+
+    db.query(Doubt).filter(Doubt.id == doubt_id).delete()
+    db.commit()
+    sync_similar_doubts(db)
+
+    assert not similar_doubts.contains(doubt_id)
+
+
+def test_unindexable_doubts_are_not_refetched(db, fetched):
+    doubt_id = add_doubt(db, "デコレーター", "とは何ですか")
+    reconcile_similar_doubts(db)
+    sync_similar_doubts(db)
+    sync_similar_doubts(db)
+
+    assert doubt_id in similar_doubts.unindexable
+    assert fetched == [[doubt_id], [], []]
+
@@ -0,0 +1,28 @@
+import pytest
+import topic_stats as module
+from topic_stats import topic_stats
+
+
+@pytest.fixture(params=["upsert", "update_then_insert"])
+def db(request, db, monkeypatch):
+    if request.param == "update_then_insert":
+        monkeypatch.setattr(module, "UPSERT_DIALECTS", {})
+    return db
+
+
+def test_add_creates_and_increments(db):
+    topic_stats.add(db, "Python", searches=1)
+    topic_stats.add(db, " python ", searches=2, doubts=1)
+    db.commit()
+
+    stats = topic_stats.get(db, "python")
+    assert (stats["searches"], stats["doubts"], stats["groups"]) == (3, 1, 0)
+
+
+def test_add_clamps_at_zero(db):
+    topic_stats.add(db, "rust", members=-1)
+    topic_stats.add(db, "rust", members=2)
+    topic_stats.add(db, "rust", members=-5)
+    db.commit()
+
+    assert topic_stats.get(db, "rust")["members"] == 0
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+import pytest
+from models import SearchHistory
+from trending import rebuild_trending, sync_trending, trending_topics
+
+
+@pytest.fixture(autouse=True)
+def reset_trending():
+    trending_topics.clear()
+    yield
+    trending_topics.clear()
+
+
+def add_searches(db, topic, count, ago):
+    at = datetime.utcnow() - ago
+    db.add_all(SearchHistory(user_id=db.user_id, topic=topic, searched_at=at) for _ in range(count))
+    db.commit()
+
+
+def test_rebuild_replays_the_last_day(db):
+    add_searches(db, "python", 5, timedelta(minutes=30))
+    add_searches(db, "rust", 5, timedelta(hours=5))
+    add_searches(db, "cobol", 5, timedelta(days=2))
+
+    rebuild_trending(db)
+
+    assert trending_topics.top("hour") == [{"topic": "python", "count": 5}]
+    assert sorted(trending_topics.top("day"), key=lambda item: item["topic"]) == [
+        {"topic": "python", "count": 5},
+        {"topic": "rust", "count": 5},
+    ]
+
+
+def test_sync_counts_new_rows_once(db):
+    add_searches(db, "python", 2, timedelta(minutes=1))
+    rebuild_trending(db)
+
+    add_searches(db, "python", 3, timedelta(seconds=0))
+    sync_trending(db)
+    sync_trending(db)
+
+    assert trending_topics.top("hour") == [{"topic": "python", "count": 5}]
+
+
+def test_sync_picks_up_late_commits_below_the_last_id(db):
+    now = datetime.utcnow()
+    db.add_all(
+        SearchHistory(id=search_id, user_id=db.user_id, topic="python", searched_at=now)
+        for search_id in (1, 3)
+    )
+    db.commit()
+    rebuild_trending(db)
+
+    # Row 2 was allocated before row 3 but its transaction committed later.
+    db.add(SearchHistory(id=2, user_id=db.user_id, topic="rust", searched_at=now))
+    db.commit()
+    sync_trending(db)
+    sync_trending(db)
+
+    assert sorted(trending_topics.top("hour"), key=lambda item: item["topic"]) == [
+        {"topic": "python", "count": 2},
+        {"topic": "rust", "count": 1},
+    ]
@@ -0,0 +1,182 @@
+import threading
+from datetime import datetime
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from config import get_settings
+from database import SessionLocal
+from models import Doubt, Group, SearchHistory, SearchHistoryRollup, Topic, TopicStat, group_members
+from trending import normalize_topic
+
+settings = get_settings()
+
+COUNTERS = ("groups", "doubts", "members", "searches")
+
+
+# Dialects with INSERT ... ON CONFLICT; others update, then insert in a savepoint.
+UPSERT_DIALECTS = {"postgresql": postgresql, "sqlite": sqlite}
+
+
+def _upsert(db: Session):
+    """An ON CONFLICT-capable insert for the session's dialect, or None"""
+    dialect = UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    return dialect.insert(TopicStat.__table__) if dialect else None
+
+
+def _insert_new(db: Session, row: dict) -> bool:
+    """Insert a row unless the topic already exists; returns False if it did"""
+    try:
+        with db.begin_nested():
+            db.execute(TopicStat.__table__.insert().values(**row))
+        return True
+    except IntegrityError:
+        return False
+
+
+class TopicStats:
+    """Per-topic counters stored in the topic_stats table.
+
+    The write paths add their deltas inside their own transaction with an
+    atomic upsert, so every worker reads the same numbers. Groups reference
+    topics by id while doubts and searches carry free-text topic names, so
+    rows are keyed by the normalized topic name. A periodic reconciliation on
+    the primary worker recomputes them from the source tables to repair drift.
+    """
+
+    def __init__(self, interval_seconds: int):
+        self.interval_seconds = interval_seconds
+        self.names = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def add(self, db: Session, topic: str, **deltas):
+        """Apply deltas (clamped at 0) as part of db's current transaction"""
+        key = normalize_topic(topic)
+        if not key:
+            return
+        table = TopicStat.__table__
+        initial = {name: max(0, delta) for name, delta in deltas.items()}
+        changes = {
+            name: case((table.c[name] + delta < 0, 0), else_=table.c[name] + delta)
+            for name, delta in deltas.items()
+        }
+        upsert = _upsert(db)
+        if upsert is not None:
+            db.execute(
+                upsert.values(topic=key, **initial).on_conflict_do_update(
+                    index_elements=[table.c.topic], set_=changes
+                )
+            )
+            return
+
+        update = table.update().where(table.c.topic == key).values(**changes)
+        if db.execute(update).rowcount == 0 and not _insert_new(db, {"topic": key, **initial}):
+            # Another transaction inserted the topic first.
+            db.execute(update)
+
+    def get(self, db: Session, topic: str) -> dict:
+        row = db.get(TopicStat, normalize_topic(topic))
+        stats = {name: getattr(row, name) if row else 0 for name in COUNTERS}
+        stats["reconciled_at"] = row.reconciled_at if row else None
+        return stats
+
+    def topic_name(self, db: Session, topic_id: int):
+        """Topic name for an id, cached since topics are never renamed"""
+        name = self.names.get(topic_id)
+        if name is None:
+            name = db.query(Topic.name).filter(Topic.id == topic_id).scalar()
+            if name is not None:
+                self.names[topic_id] = name
+        return name
+
+    def reconcile(self, db: Session, batch_size: int = 500):
+        """Recompute every counter from the source tables and store them.
+
+        Increments that commit while this runs may be counted twice or lost
+        until the next reconciliation.
+        """
+        fresh = {}
+
+        def bump(topic, name, amount):
+            key = normalize_topic(topic or "")
+            if key and amount:
+                counts = fresh.setdefault(key, dict.fromkeys(COUNTERS, 0))
+                counts[name] += int(amount)
+
+        for name, count in (
+            db.query(Topic.name, func.count(Group.id))
+            .join(Group, Group.topic_id == Topic.id)
+            .group_by(Topic.name)
+        ):
+            bump(name, "groups", count)
+        for name, count in (
+            db.query(Topic.name, func.count())
+            .select_from(group_members)
+            .join(Group, Group.id == group_members.c.group_id)
+            .join(Topic, Topic.id == Group.topic_id)
+            .group_by(Topic.name)
+        ):
+            bump(name, "members", count)
+        for topic, count in db.query(Doubt.topic, func.count(Doubt.id)).group_by(Doubt.topic):
+            bump(topic, "doubts", count)
+        for topic, count in db.query(
+            SearchHistory.topic, func.count(SearchHistory.id)
+        ).group_by(SearchHistory.topic):
+            bump(topic, "searches", count)
+        for topic, count in db.query(
+            SearchHistoryRollup.topic, func.sum(SearchHistoryRollup.search_count)
+        ).group_by(SearchHistoryRollup.topic):
+            bump(topic, "searches", count)
+
+        now = datetime.utcnow()
+        existing = {topic for (topic,) in db.query(TopicStat.topic)}
+        rows = [
+            {"topic": key, **fresh.get(key, dict.fromkeys(COUNTERS, 0)), "reconciled_at": now}
+            for key in existing | set(fresh)
+        ]
+        updates = [row for row in rows if row["topic"] in existing]
+        inserts = [row for row in rows if row["topic"] not in existing]
+        for start in range(0, len(updates), batch_size):
+            db.bulk_update_mappings(TopicStat, updates[start : start + batch_size])
+            db.commit()
+        for start in range(0, len(inserts), batch_size):
+            upsert = _upsert(db)
+            for row in inserts[start : start + batch_size]:
+                if upsert is not None:
+                    db.execute(upsert.values(**row).on_conflict_do_nothing())
+                else:
+                    _insert_new(db, row)
+            db.commit()
+
+    def is_empty(self, db: Session) -> bool:
+        return db.query(TopicStat.topic).first() is None
+
+    def run_once(self):
+        db = SessionLocal()
+        try:
+            self.reconcile(db)
+        finally:
+            db.close()
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Topic stats reconciliation error: {e}")
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name="topic-stats", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+
+topic_stats = TopicStats(interval_seconds=settings.TOPIC_STATS_RECONCILE_SECONDS)
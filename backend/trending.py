@@ -0,0 +1,188 @@
+from collections import deque
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Optional
+from config import get_settings
+
+settings = get_settings()
+
+WINDOWS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.split()).lower()
+
+
+class SpaceSaving:
+    """Space-saving heavy-hitters counter holding at most `capacity` keys.
+
+    When a new key arrives and the counter is full, the key with the smallest
+    count is evicted and the newcomer inherits its count, so reported counts
+    are an upper bound that over-estimates by at most the evicted minimum.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts = {}
+
+    def add(self, key: str, count: int = 1):
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+        else:
+            victim = min(self.counts, key=self.counts.get)
+            self.counts[key] = self.counts.pop(victim) + count
+
+
+class TrendingTopics:
+    """Streaming top-k topics over a sliding window of fixed-width time buckets.
+
+    Memory is bounded by (retention / bucket width) * capacity entries no
+    matter how many searches are recorded.
+    """
+
+    def __init__(
+        self,
+        bucket_seconds: int,
+        capacity: int,
+        retention: timedelta = WINDOWS["day"],
+    ):
+        self.bucket_seconds = bucket_seconds
+        self.capacity = capacity
+        self.max_buckets = int(retention.total_seconds() // bucket_seconds) + 1
+        self.buckets = deque()
+        self.labels = {}
+        self.lock = Lock()
+        # search_history rows already counted, for syncing from the database
+        self.seen = {}  # id -> searched_at
+        self.low_id = None  # rows above this id are re-read on each sync
+        self.synced_through = None
+
+    def _bucket_id(self, at: datetime) -> int:
+        return int(at.timestamp()) // self.bucket_seconds
+
+    def _evict(self, now_id: int):
+        while self.buckets and self.buckets[0][0] <= now_id - self.max_buckets:
+            self.buckets.popleft()
+
+    def record(self, topic: str, at: Optional[datetime] = None):
+        key = normalize_topic(topic)
+        if not key:
+            return
+
+        bucket_id = self._bucket_id(at or datetime.utcnow())
+        with self.lock:
+            self.labels.setdefault(key, topic.strip())
+            if self.buckets and self.buckets[-1][0] == bucket_id:
+                counter = self.buckets[-1][1]
+            elif not self.buckets or self.buckets[-1][0] < bucket_id:
+                counter = SpaceSaving(self.capacity)
+                self.buckets.append((bucket_id, counter))
+                self._evict(bucket_id)
+            else:
+                # Late event (e.g. replayed history out of order): find its bucket.
+                counter = None
+                for index, (existing_id, existing) in enumerate(self.buckets):
+                    if existing_id == bucket_id:
+                        counter = existing
+                        break
+                    if existing_id > bucket_id:
+                        counter = SpaceSaving(self.capacity)
+                        self.buckets.insert(index, (bucket_id, counter))
+                        break
+                if counter is None:
+                    return
+                self._evict(self.buckets[-1][0])
+            counter.add(key)
+
+    def top(self, window: str = "hour", limit: int = 10) -> list:
+        now_id = self._bucket_id(datetime.utcnow())
+        oldest_id = now_id - int(WINDOWS[window].total_seconds() // self.bucket_seconds)
+
+        totals = {}
+        with self.lock:
+            self._evict(now_id)
+            for bucket_id, counter in self.buckets:
+                if bucket_id < oldest_id:
+                    continue
+                for key, count in counter.counts.items():
+                    totals[key] = totals.get(key, 0) + count
+            ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+            # Drop labels for topics that no longer appear in any bucket.
+            if len(self.labels) > self.capacity * self.max_buckets:
+                live = set()
+                for _, counter in self.buckets:
+                    live.update(counter.counts)
+                self.labels = {k: v for k, v in self.labels.items() if k in live}
+            return [
+                {"topic": self.labels.get(key, key), "count": count}
+                for key, count in ranked[:limit]
+            ]
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+            self.labels.clear()
+            self.seen.clear()
+            self.low_id = None
+            self.synced_through = None
+
+
+trending_topics = TrendingTopics(
+    bucket_seconds=settings.TRENDING_BUCKET_SECONDS,
+    capacity=settings.TRENDING_CAPACITY,
+)
+
+
+def sync_trending(db, chunk_size: int = 1000):
+    """Count search_history rows written since the last sync, by any worker.
+
+    Searches are read back from the database rather than recorded in the
+    request, so every worker converges on the same counts. After the first
+    sync, rows are read by primary key from the oldest id counted within the
+    last TRENDING_SYNC_LAG_SECONDS, which picks up transactions that
+    committed late; rows already counted are skipped.
+    """
+    from models import SearchHistory
+
+    started = datetime.utcnow()
+    lag = timedelta(seconds=settings.TRENDING_SYNC_LAG_SECONDS)
+    if trending_topics.synced_through is not None and (
+        trending_topics.synced_through < started - WINDOWS["day"]
+    ):
+        # State loaded long ago (e.g. inherited from the serve.py master):
+        # replaying everything since then would cost more than a rebuild.
+        trending_topics.clear()
+
+    rows = db.query(SearchHistory.id, SearchHistory.topic, SearchHistory.searched_at)
+    if trending_topics.low_id is None:
+        rows = rows.filter(SearchHistory.searched_at >= started - WINDOWS["day"])
+    else:
+        rows = rows.filter(SearchHistory.id > trending_topics.low_id)
+    rows = rows.order_by(SearchHistory.id).yield_per(chunk_size)
+
+    seen = trending_topics.seen
+    last_id = trending_topics.low_id or 0
+    for search_id, topic, searched_at in rows:
+        last_id = max(last_id, search_id)
+        if search_id not in seen:
+            seen[search_id] = searched_at
+            trending_topics.record(topic, searched_at)
+
+    cutoff = started - lag
+    recent = [key for key, at in seen.items() if at >= cutoff]
+    low_id = min(recent) - 1 if recent else last_id
+    for search_id in [key for key in seen if key <= low_id]:
+        del seen[search_id]
+    trending_topics.low_id = low_id
+    trending_topics.synced_through = started
+
+
+def rebuild_trending(db):
+    """Replay the last day of search_history into the in-memory counter."""
+    trending_topics.clear()
+    sync_trending(db)